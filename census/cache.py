@@ -0,0 +1,20 @@
+from common.cache import VersionCounter
+from geographic.constants import DATASET_VERSION_CHECK_INTERVAL
+
+CENSUS_VERSION_KEY = "census:profile_version"
+
+census_version = VersionCounter(CENSUS_VERSION_KEY, DATASET_VERSION_CHECK_INTERVAL)
+
+
+def get_census_version():
+    """
+    Returns the current version of the scraped census profiles, embedded in the keys of cached profile responses.
+    """
+    return census_version.get()
+
+
+def bump_census_version():
+    """
+    Moves the census profiles to a new version after a scrape wrote any of them.
+    """
+    return census_version.bump()
@@ -0,0 +1,117 @@
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from turl_street_group_assignment.settings import CENSUS_API_BASE_URL, CENSUS_API_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class CensusAPIClient:
+    """
+    Client for the Census Data API (https://api.census.gov) that reuses pooled connections,
+    retries throttled or failed calls with exponential backoff and records per-call latency.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        base_url=CENSUS_API_BASE_URL,
+        api_key=CENSUS_API_KEY,
+        pool_size=20,
+        retries=3,
+        backoff_factor=0.5,
+        timeout=10,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.latencies = []
+        self._lock = threading.Lock()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def get(self, variables, for_clause, in_clause=None):
+        """
+        Runs one query, e.g. ``get(["NAME", "P1_001N"], "county:*")``, and returns the result as a DataFrame
+        whose columns are the requested variables followed by the geography FIPS columns.
+        """
+        params = {"get": ",".join(variables), "for": for_clause}
+        if in_clause:
+            params["in"] = in_clause
+        if self.api_key:
+            params["key"] = self.api_key
+
+        started = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.latencies.append(elapsed)
+            logger.debug("Census API for=%s in=%s took %.0f ms", for_clause, in_clause, elapsed * 1000)
+
+        response.raise_for_status()
+        data = response.json()
+        return pd.DataFrame(data[1:], columns=data[0])
+
+    def get_many(self, queries):
+        """
+        Runs several ``(variables, for_clause, in_clause)`` queries concurrently over the shared connection
+        pool. Returns one ``(query, DataFrame or exception)`` pair per query, in input order.
+        """
+
+        def run(query):
+            try:
+                return query, self.get(*query)
+            except Exception as e:
+                return query, e
+
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return list(executor.map(run, queries))
+
+    @property
+    def metrics(self):
+        """
+        Call count and latency statistics (in milliseconds) of every call made by this client.
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {"calls": 0}
+
+        return {
+            "calls": len(latencies),
+            "total_ms": round(sum(latencies) * 1000, 1),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1),
+        }
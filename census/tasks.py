@@ -4,6 +4,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from celery import shared_task
 from django.contrib.contenttypes.models import ContentType
 
+from census.cache import bump_census_version
 from census.models import CensusProfile
 from census.parser import CensusQuickFactsParser
 from geographic.models import State, County, City
@@ -35,19 +36,25 @@ def scrape_census_data(model_class, parser_arg_name, threads=1, filter_by_popula
             logger.error("%s ----> %s", e, obj.name)
             return getattr(obj, "uuid", None)
 
+    processed = 0
     if threads > 1:
         with ThreadPoolExecutor(max_workers=threads) as executor:
             futures = {executor.submit(process, obj): obj for obj in objects_to_process}
+            processed = len(futures)
             for future in as_completed(futures):
                 failed = future.result()
                 if failed:
                     failed_objects.append(failed)
     else:
         for obj in objects_to_process:
+            processed += 1
             failed = process(obj)
             if failed:
                 failed_objects.append(failed)
 
+    # New profiles invalidate the cached census profile responses.
+    if processed > len(failed_objects):
+        bump_census_version()
     return failed_objects
 
 
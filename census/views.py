@@ -1,11 +1,16 @@
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from census.cache import get_census_version
 from census.models import CensusProfile
 from census.serialzers import CensusProfileSerializer
+from common.helpers import compress_payload, compressed_response
+from geographic.constants import DATASET_CACHE_TIMEOUT
 
 
 class CensusProfileViewSet(viewsets.ReadOnlyModelViewSet):
@@ -20,6 +25,11 @@ class CensusProfileViewSet(viewsets.ReadOnlyModelViewSet):
         if not entity_type or not entity_id:
             raise ValidationError("entity_type and entity_id parameters are required")
 
+        cache_key = f"census:profile:{get_census_version()}:{entity_type.lower()}:{entity_id}"
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return compressed_response(request, payload, "application/json")
+
         try:
             content_type = ContentType.objects.get(model=entity_type.lower())
             census_profile = (
@@ -27,7 +37,9 @@ class CensusProfileViewSet(viewsets.ReadOnlyModelViewSet):
             )
             if census_profile:
                 serializer = self.get_serializer(census_profile)
-                return Response(serializer.data)
+                payload = compress_payload(JSONRenderer().render(serializer.data))
+                cache.set(cache_key, payload, timeout=DATASET_CACHE_TIMEOUT)
+                return compressed_response(request, payload, "application/json")
             return Response(status=status.HTTP_404_NOT_FOUND)
         except ContentType.DoesNotExist:
             raise ValidationError(f"Invalid entity_type: {entity_type}")
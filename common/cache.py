@@ -0,0 +1,242 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """
+    Thread-safe in-process LRU of ``bytes``/``str`` values, bounded by the total size of the values it holds.
+    Entries also expire after ``timeout`` seconds as a safety net against keys that are not versioned.
+    """
+
+    def __init__(self, max_bytes, timeout):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, size, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic() + self.timeout)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+
+# Django creates one cache instance per thread, so the local tier and its counters live at module level to be
+# shared by every thread of the worker process.
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class TwoTierRedisCache(RedisCache):
+    """
+    ``django_redis`` cache with an in-process LRU tier in front of Redis, so a worker serving the same key again
+    skips the network round trip and unpickling.
+
+    Only keys starting with one of ``LOCAL_KEY_PREFIXES`` whose values are ``bytes`` or ``str`` are held locally.
+    Those keys must embed a version (e.g. the geographic dataset version) so that they never change in place:
+    entries are not invalidated across processes and only age out after ``LOCAL_TIMEOUT`` seconds.
+
+    Extra ``OPTIONS``: ``LOCAL_MAX_BYTES`` (default 64 MiB), ``LOCAL_TIMEOUT`` (default 300) and
+    ``LOCAL_KEY_PREFIXES`` (default: none, i.e. the local tier is disabled).
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        options = params.get("OPTIONS", {})
+        self._local_prefixes = tuple(options.get("LOCAL_KEY_PREFIXES", ()))
+
+        with _local_tiers_lock:
+            if server not in _local_tiers:
+                _local_tiers[server] = {
+                    "lru": LocalLRU(
+                        options.get("LOCAL_MAX_BYTES", 64 * 1024 * 1024), options.get("LOCAL_TIMEOUT", 300)
+                    ),
+                    "stats": {"local": {"hits": 0, "misses": 0}, "redis": {"hits": 0, "misses": 0}},
+                    "lock": threading.Lock(),
+                }
+            self._tier = _local_tiers[server]
+        self.local = self._tier["lru"]
+
+    def _is_local(self, key):
+        return key.startswith(self._local_prefixes) if self._local_prefixes else False
+
+    def _count(self, tier, outcome, count=1):
+        if count:
+            with self._tier["lock"]:
+                self._tier["stats"][tier][outcome] += count
+
+    def _store_local(self, key, value, version):
+        if isinstance(value, (bytes, str)):
+            self.local.set(self.make_key(key, version), value)
+        else:
+            self.local.delete(self.make_key(key, version))
+
+    def get(self, key, default=None, version=None, client=None):
+        local = self._is_local(key)
+        if local:
+            value = self.local.get(self.make_key(key, version))
+            if value is not _MISSING:
+                self._count("local", "hits")
+                return value
+            self._count("local", "misses")
+
+        value = super().get(key, _MISSING, version, client)
+        if value is _MISSING:
+            self._count("redis", "misses")
+            return default
+
+        self._count("redis", "hits")
+        if local:
+            self._store_local(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        found = {}
+        remote_keys = []
+        for key in keys:
+            value = self.local.get(self.make_key(key, version)) if self._is_local(key) else _MISSING
+            if value is _MISSING:
+                remote_keys.append(key)
+            else:
+                found[key] = value
+
+        local_keys = len([key for key in keys if self._is_local(key)])
+        self._count("local", "hits", len(found))
+        self._count("local", "misses", local_keys - len(found))
+
+        if remote_keys:
+            remote = super().get_many(remote_keys, version=version, client=client)
+            self._count("redis", "hits", len(remote))
+            self._count("redis", "misses", len(remote_keys) - len(remote))
+            for key, value in remote.items():
+                if self._is_local(key):
+                    self._store_local(key, value, version)
+            found.update(remote)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        result = super().set(key, value, timeout=timeout, version=version, client=client, nx=nx, xx=xx)
+        if self._is_local(key):
+            # With nx/xx the write may not have happened, so only the Redis copy is authoritative.
+            if nx or xx:
+                self.local.delete(self.make_key(key, version))
+            else:
+                self._store_local(key, value, version)
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().set_many(data, timeout=timeout, version=version, client=client)
+        for key, value in data.items():
+            if self._is_local(key):
+                self._store_local(key, value, version)
+        return result
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        self.local.delete(self.make_key(key, version))
+        return super().delete(key, version=version, prefix=prefix, client=client)
+
+    def delete_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(self.make_key(key, version))
+        return super().delete_many(keys, version=version, client=client)
+
+    def clear(self):
+        self.local.clear()
+        return super().clear()
+
+    @property
+    def stats(self):
+        """
+        Hit and miss counters of both tiers (for this process) and the current size of the local tier.
+        """
+        with self._tier["lock"]:
+            tiers = {tier: dict(counters) for tier, counters in self._tier["stats"].items()}
+        tiers["local"].update(entries=len(self.local), bytes=self.local.size, max_bytes=self.local.max_bytes)
+        return tiers
+
+
+class VersionCounter:
+    """
+    Version number of a body of data, kept under ``key`` in the default cache. Cached responses embed it in their
+    keys (and ETags), so bumping it invalidates all of them at once. A missing counter (e.g. after a Redis flush)
+    is initialized from the clock, so a restarted counter never reuses a version older entries were stored under.
+
+    The version is re-read at most every ``check_interval`` seconds per process.
+    """
+
+    def __init__(self, key, check_interval):
+        self.key = key
+        self.check_interval = check_interval
+        # Last version read from the cache by this process and when it was read.
+        self._known = {"version": None, "checked_at": 0.0}
+
+    def get(self):
+        if time.monotonic() - self._known["checked_at"] < self.check_interval:
+            return self._known["version"]
+
+        version = cache.get(self.key)
+        if version is None:
+            cache.add(self.key, int(time.time()), timeout=None)
+            version = cache.get(self.key)
+        self._known.update(version=version, checked_at=time.monotonic())
+        return version
+
+    def bump(self):
+        try:
+            version = cache.incr(self.key)
+        except ValueError:
+            # Nothing to increment yet: the clock-based initial version is already newer than any previous one.
+            cache.add(self.key, int(time.time()), timeout=None)
+            version = cache.get(self.key)
+
+        self._known.update(version=version, checked_at=time.monotonic())
+        logger.info("%s bumped to %s", self.key, version)
+        return version
@@ -1,17 +1,189 @@
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+import logging
+import re
+from contextlib import ExitStack
+from itertools import islice
+
 import geopandas as gpd
+import shapely
+from pyogrio.raw import open_arrow
 from django.contrib.gis.geos import GEOSGeometry, MultiPolygon, Polygon
+from django.db import transaction
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b")
+
 
+def read_shapefile_batches(path, batch_size=500, **kwargs):
+    """
+    Reads a shapefile (or any OGR dataset) as an iterator of GeoDataFrames holding at most
+    ``batch_size`` features each. The dataset is opened once and streamed as Arrow record batches,
+    so only one batch is held in memory at a time. Extra keyword arguments (``columns``, ``where``, ...)
+    are passed to ``pyogrio.raw.open_arrow``.
 
-def read_shapefile(path):
+    Returns ``None`` if the dataset cannot be opened.
+    """
+    stack = ExitStack()
     try:
-        return gpd.read_file(path)
-    except Exception as e:
-        print(f"Error reading shapefile {path}: {e}")
+        meta, reader = stack.enter_context(open_arrow(path, batch_size=batch_size, use_pyarrow=True, **kwargs))
+    except Exception:
+        logger.exception("Error reading shapefile %s", path)
         return None
 
+    geometry_name = meta["geometry_name"] or "wkb_geometry"
+
+    def batches():
+        with stack:
+            for batch in reader:
+                if not batch.num_rows:
+                    continue
+                df = batch.to_pandas()
+                geometry = shapely.from_wkb(df.pop(geometry_name))
+                yield gpd.GeoDataFrame(df, geometry=geometry, crs=meta["crs"])
+
+    return batches()
+
 
 def geometry_to_multipolygon(geometry):
     geom = GEOSGeometry(geometry.wkt, srid=4326)
     if isinstance(geom, Polygon):
         return MultiPolygon(geom)
     return geom
+
+
+def batched(iterable, size):
+    """
+    Yields lists of at most ``size`` items from ``iterable``.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def feature_hash(attributes, geometry):
+    """
+    Returns a SHA-256 hex digest over a feature's attributes and the WKB of its (shapely) geometry.
+    Used to detect features that are unchanged between two imports of the same source.
+    """
+    digest = hashlib.sha256(json.dumps(attributes, sort_keys=True, default=str).encode())
+    digest.update(shapely.to_wkb(geometry))
+    return digest.hexdigest()
+
+
+def bulk_upsert(model_class, objects, unique_fields, update_fields, batch_size=500, compare_field=None, seen_keys=None):
+    """
+    Inserts or updates ``objects`` in batches, issuing a single ``INSERT ... ON CONFLICT DO UPDATE``
+    statement per batch. Rows are matched on ``unique_fields`` (which must be backed by a unique
+    constraint) and only ``update_fields`` are overwritten for rows that already exist.
+
+    When ``compare_field`` is given (e.g. a content hash), objects whose value matches the stored row
+    are skipped entirely. If ``seen_keys`` is a set, the natural key of every object is added to it so
+    callers can find rows that disappeared from the source (see ``find_removed``).
+
+    Returns a summary with the number of added, changed and unchanged rows; per-batch counts are logged.
+    """
+    opts = model_class._meta
+    key_attnames = [opts.get_field(name).attname for name in unique_fields]
+    compare_attname = opts.get_field(compare_field).attname if compare_field else opts.pk.attname
+    update_fields = list(update_fields) + [
+        field.name for field in opts.concrete_fields if getattr(field, "auto_now", False)
+    ]
+    summary = {"added": 0, "changed": 0, "unchanged": 0}
+
+    for number, batch in enumerate(batched(objects, batch_size), start=1):
+        # Postgres refuses to touch the same row twice in one statement, so keep the last duplicate.
+        by_key = {tuple(getattr(obj, attname) for attname in key_attnames): obj for obj in batch}
+        if seen_keys is not None:
+            seen_keys.update(by_key)
+
+        lookups = {f"{attname}__in": {key[i] for key in by_key} for i, attname in enumerate(key_attnames)}
+        with transaction.atomic():
+            rows = model_class.objects.filter(**lookups).values_list(*key_attnames, compare_attname)
+            existing = {row[:-1]: row[-1] for row in rows if row[:-1] in by_key}
+            unchanged = set()
+            if compare_field:
+                unchanged = {key for key, value in existing.items() if value == getattr(by_key[key], compare_attname)}
+
+            to_write = [obj for key, obj in by_key.items() if key not in unchanged]
+            if to_write:
+                model_class.objects.bulk_create(
+                    to_write,
+                    update_conflicts=True,
+                    unique_fields=unique_fields,
+                    update_fields=update_fields,
+                )
+
+        added, changed = len(by_key) - len(existing), len(existing) - len(unchanged)
+        summary["added"] += added
+        summary["changed"] += changed
+        summary["unchanged"] += len(unchanged)
+        logger.info(
+            "%s batch %d: %d added, %d changed, %d unchanged",
+            model_class.__name__,
+            number,
+            added,
+            changed,
+            len(unchanged),
+        )
+
+    return summary
+
+
+def find_removed(queryset, unique_fields, seen_keys):
+    """
+    Returns the primary keys of rows in ``queryset`` whose natural key is not in ``seen_keys``,
+    i.e. entities that are stored but no longer present in the imported source.
+    """
+    opts = queryset.model._meta
+    key_attnames = [opts.get_field(name).attname for name in unique_fields]
+    return [row[-1] for row in queryset.values_list(*key_attnames, "pk") if row[:-1] not in seen_keys]
+
+
+def compress_payload(body):
+    """
+    Gzip-compresses a rendered response body (``str`` or ``bytes``) for caching with ``compressed_response``.
+    """
+    if isinstance(body, str):
+        body = body.encode()
+    return gzip.compress(body, compresslevel=6)
+
+
+def compressed_response(request, payload, content_type):
+    """
+    Returns a response for a gzip ``payload`` produced by ``compress_payload``. Clients accepting gzip get the
+    payload as-is with ``Content-Encoding: gzip``; it is only decompressed for clients that do not. Both bodies
+    differ byte for byte, so an ``ETag`` set on the response must be weak.
+    """
+    if ACCEPTS_GZIP_RE.search(request.headers.get("Accept-Encoding", "")):
+        response = HttpResponse(payload, content_type=content_type)
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(gzip.decompress(payload), content_type=content_type)
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+def encode_cursor(values):
+    """
+    Encodes the keyset values of the last row of a page (a JSON-serializable dict) as an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":"), default=str).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by ``encode_cursor``. Raises ``ValueError`` for malformed cursors.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+    return values
@@ -37,6 +37,16 @@ class BaseGeoEntityModel(gis_models.Model):
     name = models.CharField(max_length=100)
     boundary = gis_models.MultiPolygonField(null=True, blank=True, help_text="Geographic boundary")
     centroid = gis_models.PointField(null=True, blank=True, help_text="Representative centroid")
+    area_sq_km = models.FloatField(
+        null=True, blank=True, db_index=True, editable=False, help_text="Geodesic area of the boundary in km²"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="SHA-256 of the source attributes and geometry, used to skip unchanged features on re-import",
+    )
 
     class Meta:
         abstract = True
@@ -1 +1,293 @@
-# Create your tests here.
+import base64
+import gzip
+import os
+import tempfile
+import uuid
+from unittest import mock
+
+import geopandas as gpd
+import shapely
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django_redis.cache import RedisCache
+
+from common.cache import _MISSING, LocalLRU, TwoTierRedisCache, VersionCounter
+from common.helpers import (
+    bulk_upsert,
+    compress_payload,
+    compressed_response,
+    decode_cursor,
+    encode_cursor,
+    find_removed,
+    read_shapefile_batches,
+)
+from common.views import CacheStatsAPIView
+from geographic.models import State
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class CompressedResponseTests(SimpleTestCase):
+    body = b'{"features": []}'
+
+    def test_gzip_clients_get_the_payload_as_is(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        response = compressed_response(request, compress_payload(self.body), "application/json")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_other_clients_get_the_decompressed_body(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="identity")
+        response = compressed_response(request, compress_payload(self.body.decode()), "application/json")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.body)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+
+class ReadShapefileBatchesTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "places.shp")
+        gpd.GeoDataFrame(
+            {"NAME": ["a", "b", "c", "d", "e"], "LSAD": ["25", "57", "25", "25", "25"]},
+            geometry=shapely.buffer(shapely.points([[i, i] for i in range(5)]), 0.5),
+            crs="EPSG:4326",
+        ).to_file(self.path)
+
+    def test_streams_filtered_batches(self):
+        batches = list(read_shapefile_batches(self.path, batch_size=2, columns=["NAME", "LSAD"], where="LSAD = '25'"))
+
+        self.assertEqual([len(gdf) for gdf in batches], [2, 2])
+        self.assertEqual([name for gdf in batches for name in gdf.NAME], ["a", "c", "d", "e"])
+        self.assertEqual(batches[0].crs, "EPSG:4326")
+        self.assertTrue(shapely.equals(batches[0].geometry.iloc[0], shapely.buffer(shapely.Point(0, 0), 0.5)))
+
+    def test_unreadable_datasets_return_none(self):
+        with self.assertLogs("common.helpers", "ERROR"):
+            self.assertIsNone(read_shapefile_batches(self.path + ".missing"))
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        city = uuid.uuid4()
+        cursor = encode_cursor({"distance": 1234.5, "uuid": city})
+
+        self.assertRegex(cursor, r"^[A-Za-z0-9_=-]+$")
+        # UUIDs (and other non-JSON values) come back as strings, which the ORM accepts in lookups.
+        self.assertEqual(decode_cursor(cursor), {"distance": 1234.5, "uuid": str(city)})
+
+    def test_malformed_cursors_raise_value_error(self):
+        not_json = base64.urlsafe_b64encode(b"not json").decode()
+        not_a_dict = base64.urlsafe_b64encode(b"[1, 2]").decode()
+        for cursor in ("not base64!", "//79", not_json, not_a_dict):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class LocalLRUTests(SimpleTestCase):
+    def test_evicts_least_recently_used_values_beyond_max_bytes(self):
+        lru = LocalLRU(max_bytes=10, timeout=60)
+        lru.set("a", b"1234")
+        lru.set("b", b"1234")
+        lru.get("a")
+        lru.set("c", b"1234")
+
+        self.assertEqual(lru.get("a"), b"1234")
+        self.assertIs(lru.get("b"), _MISSING)
+        self.assertEqual(lru.get("c"), b"1234")
+        self.assertEqual((len(lru), lru.size), (2, 8))
+
+    def test_skips_values_larger_than_max_bytes(self):
+        lru = LocalLRU(max_bytes=4, timeout=60)
+        lru.set("a", b"12")
+        lru.set("a", b"12345")
+
+        self.assertEqual((len(lru), lru.size), (0, 0))
+
+    def test_replacing_a_value_updates_the_size(self):
+        lru = LocalLRU(max_bytes=10, timeout=60)
+        lru.set("a", b"1234")
+        lru.set("a", "12")
+
+        self.assertEqual(lru.get("a"), "12")
+        self.assertEqual(lru.size, 2)
+
+    def test_entries_expire(self):
+        lru = LocalLRU(max_bytes=10, timeout=60)
+        with mock.patch("common.cache.time.monotonic", return_value=100.0):
+            lru.set("a", b"1234")
+        with mock.patch("common.cache.time.monotonic", return_value=161.0):
+            self.assertIs(lru.get("a"), _MISSING)
+        self.assertEqual((len(lru), lru.size), (0, 0))
+
+    def test_delete_and_clear(self):
+        lru = LocalLRU(max_bytes=10, timeout=60)
+        lru.set("a", b"12")
+        lru.set("b", b"34")
+        lru.delete("a")
+        lru.delete("missing")
+        self.assertEqual((len(lru), lru.size), (1, 2))
+
+        lru.clear()
+        self.assertEqual((len(lru), lru.size), (0, 0))
+
+
+class TwoTierRedisCacheTests(SimpleTestCase):
+    def setUp(self):
+        # Local tiers are shared per server, so every test gets its own.
+        self.cache = TwoTierRedisCache(
+            f"redis://{uuid.uuid4().hex}:6379/0",
+            {"OPTIONS": {"LOCAL_MAX_BYTES": 100, "LOCAL_TIMEOUT": 60, "LOCAL_KEY_PREFIXES": ["tiles:"]}},
+        )
+        self.redis = {}
+
+        def get(cache, key, default=None, version=None, client=None):
+            return self.redis.get(key, default)
+
+        def get_many(cache, keys, version=None, client=None):
+            return {key: self.redis[key] for key in keys if key in self.redis}
+
+        def set(cache, key, value, timeout=None, version=None, client=None, nx=False, xx=False):
+            self.redis[key] = value
+            return True
+
+        for name, method in {"get": get, "get_many": get_many, "set": set}.items():
+            patcher = mock.patch.object(RedisCache, name, autospec=True, side_effect=method)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_repeated_gets_are_served_locally(self):
+        self.redis["tiles:1"] = b"tile"
+
+        self.assertEqual(self.cache.get("tiles:1"), b"tile")
+        self.assertEqual(self.cache.get("tiles:1"), b"tile")
+
+        self.assertEqual(RedisCache.get.call_count, 1)
+        self.assertEqual(self.cache.stats["local"]["hits"], 1)
+        self.assertEqual(self.cache.stats["local"]["misses"], 1)
+        self.assertEqual(self.cache.stats["redis"]["hits"], 1)
+
+    def test_only_prefixed_text_values_are_held_locally(self):
+        self.redis.update({"other:1": b"value", "tiles:2": {"not": "bytes"}})
+
+        for _ in range(2):
+            self.cache.get("other:1")
+            self.cache.get("tiles:2")
+
+        self.assertEqual(RedisCache.get.call_count, 4)
+        self.assertEqual(len(self.cache.local), 0)
+
+    def test_missing_keys_return_the_default(self):
+        self.assertEqual(self.cache.get("tiles:missing", "default"), "default")
+        self.assertEqual(self.cache.stats["redis"]["misses"], 1)
+
+    def test_get_many_only_asks_redis_for_keys_missing_locally(self):
+        self.cache.set("tiles:1", b"one")
+        self.redis.update({"tiles:2": b"two", "other:3": b"three"})
+
+        found = self.cache.get_many(["tiles:1", "tiles:2", "other:3", "tiles:4"])
+
+        self.assertEqual(found, {"tiles:1": b"one", "tiles:2": b"two", "other:3": b"three"})
+        self.assertEqual(RedisCache.get_many.call_args.args[1], ["tiles:2", "other:3", "tiles:4"])
+        stats = self.cache.stats
+        self.assertEqual((stats["local"]["hits"], stats["local"]["misses"]), (1, 2))
+        self.assertEqual((stats["redis"]["hits"], stats["redis"]["misses"]), (2, 1))
+
+        # tiles:2 was copied to the local tier on the way.
+        self.cache.get_many(["tiles:2"])
+        self.assertEqual(self.cache.stats["local"]["hits"], 2)
+
+    def test_conditional_sets_drop_the_local_copy(self):
+        self.cache.set("tiles:1", b"one")
+        self.cache.set("tiles:1", b"two", nx=True)
+
+        self.assertIs(self.cache.local.get(self.cache.make_key("tiles:1")), _MISSING)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VersionCounterTests(SimpleTestCase):
+    def test_initializes_from_the_clock_and_bumps(self):
+        counter = VersionCounter(f"test:{uuid.uuid4().hex}", check_interval=0)
+        with mock.patch("common.cache.time.time", return_value=1000):
+            self.assertEqual(counter.get(), 1000)
+
+        self.assertEqual(counter.bump(), 1001)
+        self.assertEqual(counter.get(), 1001)
+
+    def test_bumping_a_missing_counter_initializes_it(self):
+        counter = VersionCounter(f"test:{uuid.uuid4().hex}", check_interval=0)
+        with mock.patch("common.cache.time.time", return_value=1000):
+            self.assertEqual(counter.bump(), 1000)
+
+    def test_rereads_the_version_only_after_the_check_interval(self):
+        key = f"test:{uuid.uuid4().hex}"
+        counter = VersionCounter(key, check_interval=60)
+        version = counter.get()
+
+        VersionCounter(key, check_interval=0).bump()
+        self.assertEqual(counter.get(), version)
+
+        with mock.patch("common.cache.time.monotonic", return_value=10**9):
+            self.assertEqual(counter.get(), version + 1)
+
+
+class BulkUpsertTests(TestCase):
+    def states(self, *rows):
+        return [
+            State(fips=fips, name=name, abbreviation=fips, geoid=int(fips), content_hash=name) for fips, name in rows
+        ]
+
+    def upsert(self, *rows):
+        seen_keys = set()
+        summary = bulk_upsert(
+            State,
+            self.states(*rows),
+            unique_fields=["fips"],
+            update_fields=["name", "content_hash"],
+            batch_size=2,
+            compare_field="content_hash",
+            seen_keys=seen_keys,
+        )
+        return summary, seen_keys
+
+    def test_adds_changes_and_skips_unchanged_rows(self):
+        summary, _ = self.upsert(("01", "Alabama"), ("02", "Alaska"), ("04", "Arizona"))
+        self.assertEqual(summary, {"added": 3, "changed": 0, "unchanged": 0})
+        alabama = State.objects.get(fips="01")
+
+        summary, seen_keys = self.upsert(("01", "Alabama"), ("02", "Alaska (renamed)"), ("05", "Arkansas"))
+        self.assertEqual(summary, {"added": 1, "changed": 1, "unchanged": 1})
+        self.assertEqual(seen_keys, {("01",), ("02",), ("05",)})
+        self.assertEqual(State.objects.get(fips="02").name, "Alaska (renamed)")
+        # Unchanged rows are not written at all.
+        self.assertEqual(State.objects.get(fips="01").updated_at, alabama.updated_at)
+
+    def test_keeps_the_last_duplicate_in_a_batch(self):
+        summary, _ = self.upsert(("01", "Alabama"), ("01", "Alabama (fixed)"))
+
+        self.assertEqual(summary, {"added": 1, "changed": 0, "unchanged": 0})
+        self.assertEqual(State.objects.get(fips="01").name, "Alabama (fixed)")
+
+    def test_find_removed_reports_rows_missing_from_the_source(self):
+        self.upsert(("01", "Alabama"), ("02", "Alaska"), ("04", "Arizona"))
+        _, seen_keys = self.upsert(("01", "Alabama"), ("04", "Arizona"))
+
+        removed = find_removed(State.objects.all(), ["fips"], seen_keys)
+        self.assertEqual(removed, [State.objects.get(fips="02").pk])
+        self.assertEqual(find_removed(State.objects.filter(fips__in=["01", "04"]), ["fips"], seen_keys), [])
+
+
+class CacheStatsTests(SimpleTestCase):
+    def get(self, user):
+        request = RequestFactory().get("/api/cache/stats/")
+        request.user = user
+        return CacheStatsAPIView.as_view()(request)
+
+    def test_requires_a_staff_user(self):
+        self.assertEqual(self.get(AnonymousUser()).status_code, 403)
+        self.assertEqual(self.get(mock.Mock(is_staff=False)).status_code, 403)
+        self.assertEqual(self.get(mock.Mock(is_staff=True)).status_code, 200)
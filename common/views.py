@@ -1 +1,16 @@
-# Create your views here.
+from django.core.cache import cache
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class CacheStatsAPIView(APIView):
+    """
+    Reports the hit and miss counters of the local (in-process) and Redis cache tiers of the worker
+    process serving the request. Only available to staff users.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(getattr(cache, "stats", {}))
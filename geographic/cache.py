@@ -0,0 +1,38 @@
+from common.cache import VersionCounter
+from geographic.constants import DATASET_VERSION_CHECK_INTERVAL
+
+DATASET_VERSION_KEY = "geographic:dataset_version"
+GEOMETRY_VERSION_KEY = "geographic:geometry_version"
+
+dataset_version = VersionCounter(DATASET_VERSION_KEY, DATASET_VERSION_CHECK_INTERVAL)
+geometry_version = VersionCounter(GEOMETRY_VERSION_KEY, DATASET_VERSION_CHECK_INTERVAL)
+
+
+def get_dataset_version():
+    """
+    Returns the current version of the geographic dataset (entities, boundaries and populations). Cached
+    boundary and tile responses embed it in their keys and ETags.
+    """
+    return dataset_version.get()
+
+
+def bump_dataset_version():
+    """
+    Moves the dataset to a new version after its entities, boundaries or populations changed.
+    """
+    return dataset_version.bump()
+
+
+def get_geometry_version():
+    """
+    Returns the current version of the entity set, its boundary pieces and MSA memberships. Unlike the dataset
+    version it is not moved by population updates, so the in-process region index only reloads when they change.
+    """
+    return geometry_version.get()
+
+
+def bump_geometry_version():
+    """
+    Moves the geometry to a new version after entities, boundary pieces or MSA memberships changed.
+    """
+    return geometry_version.bump()
@@ -1,4 +1,4 @@
-from geographic.models import State, County, City
+from geographic.models import State, County, City, MSA
 
 ZOOM_TOLERANCE = {
     3: 0.05,
@@ -9,8 +9,96 @@ ZOOM_TOLERANCE = {
     14: 0.0005,
 }
 
+# Features below every threshold of their zoom band (a key of ZOOM_TOLERANCE; zooms under the lowest band use it)
+# are culled from the boundaries endpoint: too small on screen and too sparsely populated to be worth drawing.
+# Bands and entity types without rules are never culled.
+ZOOM_CULLING = {
+    "city": {
+        3: {"min_area_sq_km": 500, "min_population": 250_000},
+        5: {"min_area_sq_km": 100, "min_population": 50_000},
+        7: {"min_area_sq_km": 20, "min_population": 10_000},
+        9: {"min_area_sq_km": 2, "min_population": 1_000},
+    },
+    "county": {
+        3: {"min_area_sq_km": 2_000, "min_population": 100_000},
+        5: {"min_area_sq_km": 200},
+    },
+    "msa": {
+        3: {"min_area_sq_km": 5_000},
+    },
+}
+
+# Boundaries are only simplified below this zoom level; bands under it are precomputed in SimplifiedBoundary.
+SIMPLIFY_MAX_ZOOM = 12
+
+# Maximum number of vertices of a BoundarySubdivision piece (ST_Subdivide's max_vertices).
+SUBDIVIDE_MAX_VERTICES = 256
+
 ENTITY_MODELS = {
     "state": State,
     "county": County,
     "city": City,
+    "msa": MSA,
+}
+
+# Vector tiles: tile coordinate extent passed to ST_AsMVT/ST_AsMVTGeom, highest zoom served and browser cache lifetime.
+MVT_EXTENT = 4096
+MAX_TILE_ZOOM = 16
+TILE_CACHE_TIMEOUT = 60 * 60
+
+# Boundaries endpoint: bbox requests are snapped to the XYZ tile grid this many levels above the requested zoom
+# and cached per tile; requests covering more than MAX_BOUNDARY_TILES tiles fall back to a coarser grid.
+BOUNDARY_TILE_ZOOM_OFFSET = 2
+MAX_BOUNDARY_TILES = 64
+
+# Lifetime of cached boundaries and tiles. Their keys include the dataset version, which the import and
+# population tasks bump, so entries can live this long without going stale.
+DATASET_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+# Seconds a web process reuses the dataset version before reading it from the cache again.
+DATASET_VERSION_CHECK_INTERVAL = 2
+
+# Largest number of coordinate decimals a client may request from the boundaries endpoint.
+MAX_COORDINATE_PRECISION = 15
+# Same for TopoJSON, whose quantized coordinates (up to 360 * 10 ** precision) must stay below 2 ** 53.
+MAX_TOPOJSON_PRECISION = 8
+
+# Rows fetched per round trip from the server-side cursor when streaming boundaries (?stream=true).
+STREAM_CHUNK_SIZE = 2000
+
+# Nearby cities: page size when no limit is given, largest page a client may ask for, and default radius (metres).
+NEARBY_DEFAULT_LIMIT = 50
+NEARBY_MAX_LIMIT = 500
+NEARBY_DEFAULT_RADIUS = 20000
+
+# Caps on client-drawn query polygons (cities by polygon), and the page sizes of their results.
+QUERY_POLYGON_MAX_VERTICES = 10000
+QUERY_POLYGON_MAX_AREA_SQ_KM = 500000
+POLYGON_DEFAULT_LIMIT = 100
+POLYGON_MAX_LIMIT = 1000
+
+# Areal aggregation by polygon: entity levels the totals are interpolated from, and the CensusProfile metrics it
+# reports as name -> (CensusProfile relation, field, aggregation). "sum" metrics are counts, split by the share of
+# each entity inside the polygon; "mean" metrics are rates or medians, averaged weighted by the population inside.
+AGGREGATE_LEVELS = ("county", "city")
+AGGREGATE_METRICS = {
+    "census_population_2020": ("population", "pop_census_apr2020", "sum"),
+    "housing_units": ("socio_economic", "housing_units_v2023", "sum"),
+    "households": ("socio_economic", "households", "sum"),
+    "veterans": ("demographics", "veterans_2019_2023", "sum"),
+    "employer_establishments": ("business", "total_employer_establishments", "sum"),
+    "total_employment": ("business", "total_employment", "sum"),
+    "median_household_income": ("socio_economic", "median_household_income", "mean"),
+    "per_capita_income": ("socio_economic", "per_capita_income", "mean"),
+    "persons_in_poverty_percent": ("socio_economic", "persons_in_poverty_percent", "mean"),
+    "bachelors_degree_percent": ("socio_economic", "bachelors_degree_percent", "mean"),
+    "persons_65_over_percent": ("demographics", "persons_65_over_percent", "mean"),
 }
+
+# Largest number of points accepted by one batch encompassing-region request.
+BATCH_LOOKUP_MAX_POINTS = 10000
+
+# Number of features written per INSERT ... ON CONFLICT statement by the shapefile importers.
+IMPORT_BATCH_SIZE = 500
+
+# Number of unmatched FIPS codes logged and kept in population update summaries; the rest are only counted.
+UNMATCHED_FIPS_SAMPLE_SIZE = 20
@@ -0,0 +1,34 @@
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import GeoFunc, GeomOutputGeoFunc
+from django.db.models import BinaryField, Func
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """
+    PostGIS ``ST_SimplifyPreserveTopology``; the database-side equivalent of
+    ``GEOSGeometry.simplify(tolerance, preserve_topology=True)``.
+    """
+
+    function = "ST_SimplifyPreserveTopology"
+    geom_param_pos = (0,)
+
+
+class TileEnvelope(Func):
+    """
+    PostGIS ``ST_TileEnvelope(z, x, y)``: the web mercator (EPSG:3857) polygon of an XYZ tile.
+    """
+
+    function = "ST_TileEnvelope"
+    output_field = GeometryField(srid=3857)
+
+
+class AsMVTGeom(GeoFunc):
+    """
+    PostGIS ``ST_AsMVTGeom``: transforms a web mercator geometry into tile coordinate space, clipping it to the
+    tile bounds. The result is only meant to be aggregated by ``ST_AsMVT`` in SQL, so it is declared as a plain
+    binary field to keep Django from casting it to ``bytea`` in the select list.
+    """
+
+    function = "ST_AsMVTGeom"
+    geom_param_pos = (0, 1)
+    output_field = BinaryField()
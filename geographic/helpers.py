@@ -1,50 +1,295 @@
+import json
+import logging
+import math
+
+import geopandas as gpd
 import pandas as pd
-import requests
+import shapely
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import AsWKB
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from pyproj import Geod
+from shapely.geometry.polygon import orient
 
-from geographic.constants import ZOOM_TOLERANCE
-from turl_street_group_assignment.settings import CENSUS_API_BASE_URL, CENSUS_API_KEY
+from census.client import CensusAPIClient
+from geographic.constants import (
+    ZOOM_TOLERANCE,
+    ZOOM_CULLING,
+    SIMPLIFY_MAX_ZOOM,
+    QUERY_POLYGON_MAX_AREA_SQ_KM,
+    QUERY_POLYGON_MAX_VERTICES,
+    UNMATCHED_FIPS_SAMPLE_SIZE,
+)
+from geographic.functions import SimplifyPreserveTopology
+from geographic.models import BoundarySubdivision, SimplifiedBoundary
 
+logger = logging.getLogger(__name__)
 
-def get_simplification_tolerance(zoom):
-    for z, tol in sorted(ZOOM_TOLERANCE.items(), reverse=True):
+# Latitude limit of the web mercator projection.
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+WGS84 = Geod(ellps="WGS84")
+
+
+def subdivision_filter(model, lookup, geometry):
+    """
+    Returns a ``Q`` matching the ``model`` entities that have a ``BoundarySubdivision`` piece satisfying
+    ``piece__<lookup>=geometry``, e.g. ``subdivision_filter(County, "intersects", polygon)``. This replaces
+    ``boundary__<lookup>`` lookups, whose bounding boxes are far too coarse for huge multipolygons.
+    """
+    pieces = (
+        BoundarySubdivision.objects.filter(
+            content_type=ContentType.objects.get_for_model(model), **{f"piece__{lookup}": geometry}
+        )
+        .order_by()
+        .values("object_id")
+    )
+    return Q(pk__in=Subquery(pieces))
+
+
+def parse_query_polygon(geojson):
+    """
+    Builds the GEOS (multi)polygon of a client-supplied GeoJSON geometry (a dict or a JSON string) for the
+    spatial query endpoints. Raises ``ValueError`` with a client-facing message when the geometry is malformed,
+    not polygonal, invalid, or exceeds ``QUERY_POLYGON_MAX_VERTICES`` or ``QUERY_POLYGON_MAX_AREA_SQ_KM``.
+    """
+    if isinstance(geojson, str):
+        try:
+            geojson = json.loads(geojson)
+        except ValueError:
+            raise ValueError("Geometry is not valid JSON.")
+    if not isinstance(geojson, dict):
+        raise ValueError("Geometry must be a GeoJSON object.")
+
+    try:
+        polygon = GEOSGeometry(json.dumps(geojson), srid=4326)
+    except (GDALException, GEOSException, ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid GeoJSON geometry: {exc}")
+
+    if polygon.geom_type not in ("Polygon", "MultiPolygon"):
+        raise ValueError("Geometry must be a Polygon or MultiPolygon.")
+    if polygon.num_coords > QUERY_POLYGON_MAX_VERTICES:
+        raise ValueError(f"Geometry has more than {QUERY_POLYGON_MAX_VERTICES} vertices.")
+    if not polygon.valid:
+        raise ValueError(f"Invalid geometry: {polygon.valid_reason}")
+
+    # Geodesic area on the ellipsoid; every ring is oriented first since the area's sign follows the winding.
+    parts = shapely.get_parts(shapely.from_wkb(bytes(polygon.wkb)))
+    area = sum(abs(WGS84.geometry_area_perimeter(orient(part))[0]) for part in parts) / 1e6
+    if area > QUERY_POLYGON_MAX_AREA_SQ_KM:
+        raise ValueError(f"Geometry covers more than {QUERY_POLYGON_MAX_AREA_SQ_KM:,} km².")
+    return polygon
+
+
+def get_zoom_band(zoom):
+    """
+    Returns the ``ZOOM_TOLERANCE`` band (its lowest zoom level) that ``zoom`` falls into. Zooms below every
+    band use the lowest (coarsest) one.
+    """
+    for z in sorted(ZOOM_TOLERANCE, reverse=True):
         if zoom >= z:
-            return tol
-    return 0.0001  # Fallback for very high zoom
+            return z
+    return min(ZOOM_TOLERANCE)
+
+
+def get_simplification_tolerance(zoom):
+    return ZOOM_TOLERANCE[get_zoom_band(zoom)]
 
 
-def fetch_census_population_data(level: str, state_fips: str = None):
+def get_culling_filter(entity_type, zoom):
+    """
+    Returns a ``Q`` matching the ``entity_type`` features that stay visible at ``zoom``: those meeting at least one
+    threshold of the ``ZOOM_CULLING`` band. Returns ``None`` when nothing is culled at this zoom.
+    """
+    rule = ZOOM_CULLING.get(entity_type, {}).get(get_zoom_band(zoom))
+    if not rule:
+        return None
+
+    visible = Q()
+    if "min_area_sq_km" in rule:
+        visible |= Q(area_sq_km__gte=rule["min_area_sq_km"])
+    if "min_population" in rule:
+        visible |= Q(population__gte=rule["min_population"])
+    return visible
+
+
+def get_boundary_expression(model, zoom):
+    """
+    Returns a query expression for ``model``'s boundary at ``zoom``. Below ``SIMPLIFY_MAX_ZOOM`` this is the
+    band precomputed by ``rebuild_simplified_boundaries_task``, falling back to simplifying in the database
+    when that band is missing; from ``SIMPLIFY_MAX_ZOOM`` on it is the full-resolution boundary.
+    """
+    if zoom >= SIMPLIFY_MAX_ZOOM:
+        return F("boundary")
+
+    precomputed = (
+        SimplifiedBoundary.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            object_id=OuterRef("pk"),
+            zoom=get_zoom_band(zoom),
+        )
+        .order_by()
+        .values("boundary")[:1]
+    )
+    fallback = SimplifyPreserveTopology("boundary", get_simplification_tolerance(zoom))
+    return Coalesce(Subquery(precomputed), fallback, output_field=GeometryField(srid=4326))
+
+
+def tile_bounds(z, x, y):
+    """
+    Returns the ``(min_lng, min_lat, max_lng, max_lat)`` bounds of web mercator (XYZ) tile ``z/x/y``.
+    """
+    n = 2**z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def get_coordinate_precision(zoom):
+    """
+    Returns the number of coordinate decimals that keeps rounding errors below one pixel of a 256px tile at ``zoom``.
+    """
+    degrees_per_pixel = 360.0 / (256 * 2**zoom)
+    return max(0, math.ceil(-math.log10(degrees_per_pixel)))
+
+
+def lng_lat_to_tile(lng, lat, z):
+    """
+    Returns the ``(x, y)`` of the web mercator (XYZ) tile at zoom ``z`` containing ``lng``/``lat``.
+    """
+    n = 2**z
+    lat = max(min(lat, MAX_MERCATOR_LATITUDE), -MAX_MERCATOR_LATITUDE)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def get_bbox_tiles(bbox, z, max_tiles):
+    """
+    Returns ``(z, tiles)``: the ``(x, y)`` tiles of the XYZ grid covering ``bbox``. When that takes more than
+    ``max_tiles`` tiles at zoom ``z``, the next coarser grid is tried until the bbox fits (or zoom 0 is reached).
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    while True:
+        min_x, min_y = lng_lat_to_tile(min_lng, max_lat, z)
+        max_x, max_y = lng_lat_to_tile(max_lng, min_lat, z)
+        if z == 0 or (max_x - min_x + 1) * (max_y - min_y + 1) <= max_tiles:
+            break
+        z -= 1
+    return z, [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+def load_geometry_frame(queryset, geometry_field="boundary"):
+    """
+    Loads the geometries of ``queryset`` into a GeoDataFrame indexed by primary key.
+    Geometries are transferred as WKB and decoded by shapely in one vectorized call.
+    """
+    rows = list(
+        queryset.filter(**{f"{geometry_field}__isnull": False})
+        .annotate(wkb=AsWKB(geometry_field))
+        .values_list("pk", "wkb")
+    )
+    pks = [pk for pk, _ in rows]
+    geometries = shapely.from_wkb([bytes(wkb) for _, wkb in rows])
+    return gpd.GeoDataFrame(geometry=geometries, index=pks, crs="EPSG:4326")
+
+
+def find_containing(points, polygons):
+    """
+    Spatially joins ``points`` (a GeoSeries) against ``polygons`` (a GeoDataFrame) and returns a
+    ``{point index: polygon index}`` dict for every point that falls strictly inside a polygon,
+    i.e. the same match as ``boundary__contains=point``. Unmatched points are omitted.
+    """
+    if points.empty or polygons.empty:
+        return {}
+
+    joined = gpd.sjoin(gpd.GeoDataFrame(geometry=points), polygons, how="inner", predicate="within")
+    joined = joined[~joined.index.duplicated()]
+    return joined["index_right"].to_dict()
+
+
+def fetch_census_population_data(level: str, state_fips: str = None, client: CensusAPIClient = None):
     """
     Fetches population data from the Census API for the given level ('state', 'county', or 'place').
-    Optionally filter by state FIPS for 'county' or 'place'.
+    Optionally filter by state FIPS for 'county' or 'place'; without it the whole country is fetched
+    in a single national-scope request.
     """
+    if level not in ("state", "county", "place") or (level == "state" and state_fips):
+        raise ValueError("Invalid level or unexpected state_fips")
+
     if level == "state":
-        url = f"{CENSUS_API_BASE_URL}?get=NAME,P1_001N&for=state:*&key={CENSUS_API_KEY}"
-    elif level in ("county", "place") and state_fips:
-        url = f"{CENSUS_API_BASE_URL}?get=NAME,P1_001N&for={level}:*&in=state:{state_fips}&key={CENSUS_API_KEY}"
+        in_clause = None
+    elif state_fips:
+        in_clause = f"state:{state_fips}"
     else:
-        raise ValueError("Invalid level or missing state_fips")
+        # Places are nested in states, so a national place query still needs a state wildcard.
+        in_clause = "state:*" if level == "place" else None
 
-    response = requests.get(url, timeout=10)
-    response.raise_for_status()
-    data = response.json()
-    return pd.DataFrame(data[1:], columns=data[0])
+    if client is None:
+        with CensusAPIClient() as client:
+            return client.get(["NAME", "P1_001N"], f"{level}:*", in_clause)
+    return client.get(["NAME", "P1_001N"], f"{level}:*", in_clause)
 
 
-def update_model_population(df, model_class, fips_field, state_filter=False):
+def update_model_population(df, model_class, fips_field, state_filter=False, batch_size=1000):
     """
     Updates population field in the given model using the DataFrame.
+
+    Rows are matched on ``(state FIPS, FIPS)`` when ``state_filter`` is set (counties, cities) and on FIPS
+    alone otherwise, through a key -> pk map loaded in one query. Only rows whose population changed are
+    written, with ``bulk_update`` on the ``population`` column. Returns the number of matched, updated and
+    unmatched rows, with the first ``UNMATCHED_FIPS_SAMPLE_SIZE`` unmatched FIPS codes as a sample.
     """
-    for _, row in df.iterrows():
-        try:
-            fips = row[fips_field]
-            filters = {"fips": fips}
-
-            if state_filter:
-                filters["state__fips"] = row["state"].zfill(2)
-
-            obj = model_class.objects.get(**filters)
-            obj.population = int(row["P1_001N"])
-            obj.save()
-            print(f"✅ Updated: {obj}")
-        except model_class.DoesNotExist:
-            print(f"❌ {model_class.__name__} with FIPS {fips} not found.")
+    fips = df[fips_field].astype(str)
+    populations = pd.to_numeric(df["P1_001N"]).astype("int64")
+
+    queryset = model_class.objects.all()
+    if state_filter:
+        state_fips = df["state"].astype(str).str.zfill(2)
+        keys = list(zip(state_fips, fips))
+        queryset = queryset.filter(state__fips__in=set(state_fips))
+        existing = {
+            (s, f): (pk, pop) for s, f, pk, pop in queryset.values_list("state__fips", "fips", "pk", "population")
+        }
+    else:
+        keys = list(fips)
+        existing = {f: (pk, pop) for f, pk, pop in queryset.values_list("fips", "pk", "population")}
+
+    to_update = []
+    unmatched_count = 0
+    unmatched_sample = []
+    for key, population in zip(keys, populations.tolist()):
+        if key not in existing:
+            unmatched_count += 1
+            if len(unmatched_sample) < UNMATCHED_FIPS_SAMPLE_SIZE:
+                unmatched_sample.append("".join(key) if state_filter else key)
+            continue
+        pk, current = existing[key]
+        if current != population:
+            to_update.append(model_class(pk=pk, population=population))
+
+    model_class.objects.bulk_update(to_update, ["population"], batch_size=batch_size)
+
+    summary = {
+        "matched": len(keys) - unmatched_count,
+        "updated": len(to_update),
+        "unmatched_count": unmatched_count,
+        "unmatched_sample": unmatched_sample,
+    }
+    if unmatched_count:
+        logger.warning(
+            "❌ %d %s FIPS codes not found, e.g. %s",
+            unmatched_count,
+            model_class.__name__,
+            ", ".join(unmatched_sample),
+        )
+    logger.info(
+        "✅ Updated population for %d of %d matched %s rows", len(to_update), summary["matched"], model_class.__name__
+    )
+    return summary
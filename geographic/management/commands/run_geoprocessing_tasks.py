@@ -1,4 +1,9 @@
-from django.core.management.base import BaseCommand
+import time
+import uuid
+
+from celery import chain, group
+from celery.result import AsyncResult
+from django.core.management.base import BaseCommand, CommandError
 
 from geographic.tasks import (
     import_msas_from_shapefile_task,
@@ -8,21 +13,157 @@ from geographic.tasks import (
     update_populations_for_states_task,
     update_populations_for_counties_task,
     update_populations_for_cities_task,
+    rebuild_simplified_boundaries_task,
+    rebuild_boundary_subdivisions_task,
+    assign_msas_task,
 )
 
+# Stage name -> (task, kwargs, upstream stages). A stage only starts once its upstream stages have finished;
+# stages sharing an upstream stage run in parallel. Stages with several upstream stages run after every
+# stage chained under the root stages.
+STAGES = {
+    "states": (import_states_from_shapefile_task, {}, ()),
+    "counties": (import_counties_from_shapefile_task, {}, ("states",)),
+    "cities": (import_cities_from_place_zips_task, {}, ("counties",)),
+    "msas": (import_msas_from_shapefile_task, {}, ()),
+    "state_population": (update_populations_for_states_task, {}, ("states",)),
+    "county_population": (update_populations_for_counties_task, {}, ("counties",)),
+    "city_population": (update_populations_for_cities_task, {}, ("cities",)),
+    "state_simplification": (rebuild_simplified_boundaries_task, {"entity_type": "state"}, ("states",)),
+    "county_simplification": (rebuild_simplified_boundaries_task, {"entity_type": "county"}, ("counties",)),
+    "city_simplification": (rebuild_simplified_boundaries_task, {"entity_type": "city"}, ("cities",)),
+    "msa_simplification": (rebuild_simplified_boundaries_task, {"entity_type": "msa"}, ("msas",)),
+    "state_subdivision": (rebuild_boundary_subdivisions_task, {"entity_type": "state"}, ("states",)),
+    "county_subdivision": (rebuild_boundary_subdivisions_task, {"entity_type": "county"}, ("counties",)),
+    "city_subdivision": (rebuild_boundary_subdivisions_task, {"entity_type": "city"}, ("cities",)),
+    "msa_subdivision": (rebuild_boundary_subdivisions_task, {"entity_type": "msa"}, ("msas",)),
+    "msa_membership": (assign_msas_task, {}, ("counties", "msas")),
+}
+
+IMPORT_STAGES = ("states", "counties", "cities", "msas")
+
 
 class Command(BaseCommand):
-    help = "Enqueue geospatial import and population update tasks via Celery."
+    help = "Run the geospatial import and population update tasks via Celery, respecting their dependencies."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-wait", action="store_true", help="Enqueue the workflow and exit without waiting for it."
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=2.0, help="Seconds between progress checks (default: 2)."
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=6 * 60 * 60,
+            help="Seconds to wait for the workflow before giving up on unfinished stages (default: 6 hours).",
+        )
+        parser.add_argument(
+            "--prune", action="store_true", help="Delete entities that are no longer present in the shapefiles."
+        )
+
+    def build_workflow(self, prune=False):
+        """
+        Builds the Celery canvas from ``STAGES``: states -> counties -> cities, with MSAs imported in parallel
+        and every follow-up stage (population updates, boundary simplification and subdivision) running as soon as the
+        entities it needs exist. Stages joining several branches (MSA membership) run once every root tree is done.
+        Every stage gets a fixed task id so its progress can be polled.
+        """
+        signatures = {}
+        for name, (task, kwargs, _) in STAGES.items():
+            if name in IMPORT_STAGES:
+                kwargs = {**kwargs, "prune": prune}
+            signatures[name] = task.si(**kwargs).set(task_id=str(uuid.uuid4()))
+
+        def subtree(name):
+            children = [child for child, (_, _, upstream) in STAGES.items() if upstream == (name,)]
+            if not children:
+                return signatures[name]
+            if len(children) == 1:
+                return chain(signatures[name], subtree(children[0]))
+            return chain(signatures[name], group([subtree(child) for child in children]))
+
+        workflow = group([subtree(name) for name, (_, _, upstream) in STAGES.items() if not upstream])
+        joins = [signatures[name] for name, (_, _, upstream) in STAGES.items() if len(upstream) > 1]
+        if joins:
+            workflow = chain(workflow, group(joins))
+        return workflow, {name: signature.options["task_id"] for name, signature in signatures.items()}
+
+    @staticmethod
+    def waits_for(name):
+        """
+        Stages ``name`` actually waits for in the canvas: its upstream stages, or every other stage for a join
+        stage, which is chained after the whole workflow.
+        """
+        upstream = STAGES[name][2]
+        if len(upstream) > 1:
+            return tuple(stage for stage, (_, _, other) in STAGES.items() if len(other) <= 1)
+        return upstream
+
+    def started_at(self, name, finished_at, started):
+        """
+        When a stage could start: once the last stage it waits for finished, or with the workflow.
+        """
+        return max((finished_at.get(stage, started) for stage in self.waits_for(name)), default=started)
 
     def handle(self, *args, **options):
-        self.stdout.write("Enqueuing import tasks...")
+        workflow, task_ids = self.build_workflow(prune=options["prune"])
+
+        self.stdout.write("Enqueuing import workflow...")
+        started = time.monotonic()
+        workflow.apply_async()
+
+        if options["no_wait"]:
+            self.stdout.write("All tasks have been enqueued.")
+            return
+
+        finished_at = {}
+        outcomes = {}
+        deadline = started + options["timeout"]
+        while len(outcomes) < len(STAGES):
+            for name, task_id in task_ids.items():
+                if name in outcomes:
+                    continue
+
+                failed = [
+                    stage for stage in self.waits_for(name) if stage in outcomes and outcomes[stage][0] != "SUCCESS"
+                ]
+                if failed:
+                    outcomes[name] = ("SKIPPED", f"{', '.join(failed)} did not succeed")
+                    finished_at[name] = time.monotonic()
+                    self.stdout.write(self.style.WARNING(f"- {name} skipped"))
+                    continue
+
+                result = AsyncResult(task_id)
+                if not result.ready():
+                    continue
+
+                finished_at[name] = time.monotonic()
+                outcomes[name] = (result.state, result.result)
+                elapsed = finished_at[name] - self.started_at(name, finished_at, started)
+                if result.successful():
+                    self.stdout.write(self.style.SUCCESS(f"✔ {name} finished in {elapsed:.1f}s: {result.result}"))
+                else:
+                    self.stdout.write(self.style.ERROR(f"✘ {name} failed after {elapsed:.1f}s: {result.result!r}"))
+
+            if len(outcomes) < len(STAGES):
+                if time.monotonic() >= deadline:
+                    # A lost or revoked result never becomes ready; stop waiting for it.
+                    for name in STAGES:
+                        if name not in outcomes:
+                            outcomes[name] = ("TIMEOUT", None)
+                            finished_at[name] = time.monotonic()
+                            self.stdout.write(self.style.ERROR(f"✘ {name} did not finish in time"))
+                    break
+                time.sleep(options["poll_interval"])
 
-        import_msas_from_shapefile_task.delay()
-        import_states_from_shapefile_task.delay()
-        import_counties_from_shapefile_task.delay()
-        import_cities_from_place_zips_task.delay()
-        update_populations_for_states_task.delay()
-        update_populations_for_counties_task.delay()
-        update_populations_for_cities_task.delay()
+        self.stdout.write("\nStage timings:")
+        for name in STAGES:
+            elapsed = finished_at[name] - self.started_at(name, finished_at, started)
+            self.stdout.write(f"  {name:<24} {outcomes[name][0]:<8} {elapsed:8.1f}s")
+        self.stdout.write(f"  {'total':<24} {'':<8} {time.monotonic() - started:8.1f}s")
 
-        self.stdout.write("All tasks have been enqueued.")
+        timed_out = [name for name, (state, _) in outcomes.items() if state == "TIMEOUT"]
+        if timed_out:
+            raise CommandError(f"Timed out after {options['timeout']:.0f}s waiting for: {', '.join(timed_out)}")
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geographic", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="city",
+            constraint=models.UniqueConstraint(fields=("state", "fips"), name="unique_city_state_fips"),
+        ),
+        migrations.AddConstraint(
+            model_name="county",
+            constraint=models.UniqueConstraint(fields=("state", "fips"), name="unique_county_state_fips"),
+        ),
+        migrations.AddConstraint(
+            model_name="msa",
+            constraint=models.UniqueConstraint(fields=("fips",), name="unique_msa_fips"),
+        ),
+        migrations.AddConstraint(
+            model_name="state",
+            constraint=models.UniqueConstraint(fields=("fips",), name="unique_state_fips"),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geographic", "0002_unique_fips_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="city",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the source attributes and geometry, used to skip unchanged features on re-import",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="county",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the source attributes and geometry, used to skip unchanged features on re-import",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="msa",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the source attributes and geometry, used to skip unchanged features on re-import",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="state",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the source attributes and geometry, used to skip unchanged features on re-import",
+                max_length=64,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:45
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("geographic", "0003_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimplifiedBoundary",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "uuid",
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True
+                    ),
+                ),
+                ("object_id", models.UUIDField()),
+                ("zoom", models.PositiveSmallIntegerField(help_text="Lowest zoom level of the ZOOM_TOLERANCE band")),
+                ("tolerance", models.FloatField(help_text="Simplification tolerance in degrees")),
+                (
+                    "source_hash",
+                    models.CharField(
+                        blank=True, help_text="content_hash of the source entity", max_length=64, null=True
+                    ),
+                ),
+                (
+                    "boundary",
+                    django.contrib.gis.db.models.fields.MultiPolygonField(
+                        help_text="Simplified geographic boundary", srid=4326
+                    ),
+                ),
+                (
+                    "content_type",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="contenttypes.contenttype"),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "abstract": False,
+                "indexes": [models.Index(fields=["content_type", "zoom"], name="geographic__content_9b1f3b_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="simplifiedboundary",
+            constraint=models.UniqueConstraint(
+                fields=("content_type", "object_id", "zoom"), name="unique_simplified_boundary"
+            ),
+        ),
+    ]
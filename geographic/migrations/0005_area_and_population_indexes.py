@@ -0,0 +1,63 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geographic", "0004_simplifiedboundary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="city",
+            name="area_sq_km",
+            field=models.FloatField(
+                blank=True, db_index=True, editable=False, help_text="Geodesic area of the boundary in km²", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="county",
+            name="area_sq_km",
+            field=models.FloatField(
+                blank=True, db_index=True, editable=False, help_text="Geodesic area of the boundary in km²", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="msa",
+            name="area_sq_km",
+            field=models.FloatField(
+                blank=True, db_index=True, editable=False, help_text="Geodesic area of the boundary in km²", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="state",
+            name="area_sq_km",
+            field=models.FloatField(
+                blank=True, db_index=True, editable=False, help_text="Geodesic area of the boundary in km²", null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="city",
+            name="population",
+            field=models.BigIntegerField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="county",
+            name="population",
+            field=models.BigIntegerField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="state",
+            name="population",
+            field=models.BigIntegerField(db_index=True, null=True),
+        ),
+    ] + [
+        # Backfill the area of existing entities; imports keep it up to date from here on.
+        migrations.RunSQL(
+            f"UPDATE geographic_{model} SET area_sq_km = ST_Area(boundary::geography) / 1e6 WHERE boundary IS NOT NULL",
+            migrations.RunSQL.noop,
+        )
+        for model in ("state", "county", "city", "msa")
+    ]
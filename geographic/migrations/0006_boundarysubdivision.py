@@ -0,0 +1,66 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:56
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("geographic", "0005_area_and_population_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BoundarySubdivision",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "uuid",
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True
+                    ),
+                ),
+                ("object_id", models.UUIDField()),
+                (
+                    "source_hash",
+                    models.CharField(
+                        blank=True, help_text="content_hash of the source entity", max_length=64, null=True
+                    ),
+                ),
+                (
+                    "piece",
+                    django.contrib.gis.db.models.fields.PolygonField(
+                        help_text="Subdivided piece of the entity boundary", srid=4326
+                    ),
+                ),
+                (
+                    "content_type",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="contenttypes.contenttype"),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "abstract": False,
+                "indexes": [models.Index(fields=["content_type", "object_id"], name="geographic__content_42e869_idx")],
+            },
+        ),
+    ] + [
+        # Subdivide the boundaries of existing entities; imports keep the pieces up to date from here on.
+        migrations.RunSQL(
+            f"""
+            INSERT INTO geographic_boundarysubdivision
+                (uuid, created_at, updated_at, content_type_id, object_id, source_hash, piece)
+            SELECT gen_random_uuid(), now(), now(), ct.id, e.uuid, e.content_hash, ST_Subdivide(e.boundary, 256)
+            FROM geographic_{model} e
+            JOIN django_content_type ct ON ct.app_label = 'geographic' AND ct.model = '{model}'
+            WHERE e.boundary IS NOT NULL
+            """,
+            migrations.RunSQL.noop,
+        )
+        for model in ("state", "county", "city", "msa")
+    ]
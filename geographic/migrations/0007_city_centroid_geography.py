@@ -0,0 +1,31 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:58
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geographic", "0006_boundarysubdivision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="city",
+            name="centroid_geography",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                editable=False,
+                geography=True,
+                help_text="Copy of the centroid as geography, for index-assisted radius and nearest-neighbour searches in metres",
+                null=True,
+                srid=4326,
+            ),
+        ),
+        # Backfill existing cities; imports keep the column up to date from here on.
+        migrations.RunSQL(
+            "UPDATE geographic_city SET centroid_geography = centroid::geography WHERE centroid IS NOT NULL",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.20 on 2026-10-17 21:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geographic", "0007_city_centroid_geography"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="county",
+            name="msa",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="MSA containing a point on the county's surface, assigned after imports",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="counties",
+                to="geographic.msa",
+            ),
+        ),
+        # Backfill existing rows; assign_msas_task keeps the memberships up to date from here on.
+        migrations.RunSQL(
+            """
+            UPDATE geographic_county c SET msa_id = (
+                SELECT m.uuid FROM geographic_msa m WHERE ST_Intersects(m.boundary, ST_PointOnSurface(c.boundary)) LIMIT 1
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
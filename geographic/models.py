@@ -1,13 +1,21 @@
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db import models as gis_models
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Lower
 
 from common.models import BaseTimeStampedUUIDModel, BaseGeoEntityModel
 
 
 class State(BaseTimeStampedUUIDModel, BaseGeoEntityModel):
-    population = models.BigIntegerField(null=True)
+    population = models.BigIntegerField(null=True, db_index=True)
     fips = models.CharField(max_length=2, help_text="State FIPS code")
     abbreviation = models.CharField(max_length=2, help_text="State abbreviation")
 
+    class Meta(BaseTimeStampedUUIDModel.Meta):
+        constraints = [models.UniqueConstraint(fields=["fips"], name="unique_state_fips")]
+
     def __str__(self):
         return f"{self.name} ({self.abbreviation})"
 
@@ -19,12 +27,28 @@ class State(BaseTimeStampedUUIDModel, BaseGeoEntityModel):
     def quick_fact_slug(self):
         return self.abbreviation.lower()
 
+    @staticmethod
+    def quick_fact_slug_expression():
+        """Query expression equivalent of ``quick_fact_slug``."""
+        return Lower("abbreviation")
+
 
 class County(BaseTimeStampedUUIDModel, BaseGeoEntityModel):
-    population = models.BigIntegerField(null=True)
+    population = models.BigIntegerField(null=True, db_index=True)
     fips = models.CharField(max_length=3, help_text="County FIPS code")
     namelsad = models.CharField(max_length=225, help_text="Full legal/statistical name")
     state = models.ForeignKey(State, on_delete=models.CASCADE, related_name="counties")
+    msa = models.ForeignKey(
+        "MSA",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="counties",
+        help_text="MSA containing a point on the county's surface, assigned after imports",
+    )
+
+    class Meta(BaseTimeStampedUUIDModel.Meta):
+        constraints = [models.UniqueConstraint(fields=["state", "fips"], name="unique_county_state_fips")]
 
     def __str__(self):
         return f"{self.name}, {self.state.abbreviation}"
@@ -37,13 +61,28 @@ class County(BaseTimeStampedUUIDModel, BaseGeoEntityModel):
     def quick_fact_slug(self):
         return self.qf_fips
 
+    @staticmethod
+    def quick_fact_slug_expression():
+        """Query expression equivalent of ``quick_fact_slug``."""
+        return Concat("state__fips", "fips")
+
 
 class City(BaseTimeStampedUUIDModel, BaseGeoEntityModel):
-    population = models.BigIntegerField(null=True)
+    population = models.BigIntegerField(null=True, db_index=True)
     fips = models.CharField(max_length=7, help_text="City FIPS code")
     namelsad = models.CharField(max_length=225, help_text="Full legal/statistical name")
     state = models.ForeignKey(State, on_delete=models.CASCADE, related_name="cities")
     county = models.ForeignKey(County, on_delete=models.SET_NULL, null=True, blank=True, related_name="cities")
+    centroid_geography = gis_models.PointField(
+        geography=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Copy of the centroid as geography, for index-assisted radius and nearest-neighbour searches in metres",
+    )
+
+    class Meta(BaseTimeStampedUUIDModel.Meta):
+        constraints = [models.UniqueConstraint(fields=["state", "fips"], name="unique_city_state_fips")]
 
     def __str__(self):
         return f"{self.name}, {self.state.abbreviation}"
@@ -56,11 +95,75 @@ class City(BaseTimeStampedUUIDModel, BaseGeoEntityModel):
     def quick_fact_slug(self):
         return self.qf_fips
 
+    @staticmethod
+    def quick_fact_slug_expression():
+        """Query expression equivalent of ``quick_fact_slug``."""
+        return Concat("state__fips", "fips")
+
 
 class MSA(BaseTimeStampedUUIDModel, BaseGeoEntityModel):
     fips = models.CharField(max_length=7, help_text="City FIPS code")
     lsad = models.CharField(max_length=4, help_text="Type: M1 = Metropolitan (MSA), M2 = Micropolitan")
     namelsad = models.CharField(max_length=225, help_text="Full legal/statistical name")
 
+    class Meta(BaseTimeStampedUUIDModel.Meta):
+        constraints = [models.UniqueConstraint(fields=["fips"], name="unique_msa_fips")]
+
     def __str__(self):
         return f"{self.name}"
+
+    @property
+    def quick_fact_slug(self):
+        # QuickFacts has no pages for metropolitan areas.
+        return None
+
+    @staticmethod
+    def quick_fact_slug_expression():
+        """Query expression equivalent of ``quick_fact_slug``."""
+        return Value(None, output_field=models.CharField())
+
+
+class SimplifiedBoundary(BaseTimeStampedUUIDModel):
+    """
+    Boundary of a geographic entity simplified once for a ``ZOOM_TOLERANCE`` band, so the boundaries
+    endpoint can serve low zoom levels without running GEOS simplification on every request.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.UUIDField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    zoom = models.PositiveSmallIntegerField(help_text="Lowest zoom level of the ZOOM_TOLERANCE band")
+    tolerance = models.FloatField(help_text="Simplification tolerance in degrees")
+    source_hash = models.CharField(max_length=64, null=True, blank=True, help_text="content_hash of the source entity")
+    boundary = gis_models.MultiPolygonField(help_text="Simplified geographic boundary")
+
+    class Meta(BaseTimeStampedUUIDModel.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=["content_type", "object_id", "zoom"], name="unique_simplified_boundary")
+        ]
+        indexes = [models.Index(fields=["content_type", "zoom"])]
+
+    def __str__(self):
+        return f"Simplified boundary (zoom {self.zoom}) for {self.content_object}"
+
+
+class BoundarySubdivision(BaseTimeStampedUUIDModel):
+    """
+    Piece of a geographic entity's boundary cut with ``ST_Subdivide`` so that no piece has more than
+    ``SUBDIVIDE_MAX_VERTICES`` vertices. Spatial lookups against these small pieces (and their tight bounding
+    boxes) are far cheaper than against the full boundaries of states, MSAs or coastal counties.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.UUIDField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    source_hash = models.CharField(max_length=64, null=True, blank=True, help_text="content_hash of the source entity")
+    piece = gis_models.PolygonField(help_text="Subdivided piece of the entity boundary")
+
+    class Meta(BaseTimeStampedUUIDModel.Meta):
+        indexes = [models.Index(fields=["content_type", "object_id"])]
+
+    def __str__(self):
+        return f"Boundary piece of {self.content_object}"
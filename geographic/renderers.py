@@ -0,0 +1,10 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class TopoJSONRenderer(JSONRenderer):
+    """
+    Accepts ``?format=topojson`` during content negotiation. Views that support it check
+    ``request.accepted_renderer.format`` and build the topology themselves; error responses render as JSON.
+    """
+
+    format = "topojson"
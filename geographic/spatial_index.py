@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import shapely
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models.functions import AsWKB
+from django.db import connection
+
+from geographic.cache import get_geometry_version
+from geographic.models import BoundarySubdivision, City, County, MSA
+
+logger = logging.getLogger(__name__)
+
+# Levels answered by the region index, in response order.
+REGION_LEVELS = {
+    "city": City,
+    "county": County,
+    "msa": MSA,
+}
+
+
+class LevelIndex:
+    """
+    STRtree over the prepared ``BoundarySubdivision`` pieces of one entity model. Point lookups query the tree
+    for candidate pieces by bounding box and confirm them with a vectorized test against the prepared pieces.
+    """
+
+    def __init__(self, model):
+        rows = list(
+            BoundarySubdivision.objects.filter(content_type=ContentType.objects.get_for_model(model))
+            .order_by()
+            .annotate(wkb=AsWKB("piece"))
+            .values_list("object_id", "wkb")
+        )
+        self.owners = np.array([object_id for object_id, _ in rows], dtype=object)
+        self.pieces = shapely.from_wkb([bytes(wkb) for _, wkb in rows])
+        shapely.prepare(self.pieces)
+        self.tree = shapely.STRtree(self.pieces)
+        self.names = dict(model.objects.values_list("uuid", "name"))
+        self.coordinates = int(shapely.get_num_coordinates(self.pieces).sum()) if len(rows) else 0
+
+    def find_many(self, points):
+        """
+        Returns, for each shapely point, the uuid of the entity containing it (or ``None``), in input order.
+        Points on a boundary count as inside; when pieces of several entities match, the first one wins.
+        """
+        result = np.full(len(points), None, dtype=object)
+        if not len(self.pieces):
+            return result
+
+        # Bounding box candidates from the tree, confirmed against the prepared pieces in one vectorized call.
+        point_indexes, piece_indexes = self.tree.query(points)
+        hits = shapely.intersects(self.pieces[piece_indexes], points[point_indexes])
+        point_indexes, piece_indexes = point_indexes[hits], piece_indexes[hits]
+        # The tree returns candidates sorted by input point; keep the first match of every point.
+        first = np.unique(point_indexes, return_index=True)[1]
+        result[point_indexes[first]] = self.owners[piece_indexes[first]]
+        return result
+
+
+class RegionIndex:
+    """
+    Process-local point-in-polygon index of every ``REGION_LEVELS`` level, built for one geometry version.
+    """
+
+    def __init__(self, version):
+        started = time.monotonic()
+        self.version = version
+        self.levels = {level: LevelIndex(model) for level, model in REGION_LEVELS.items()}
+        # Precomputed MSA of every county (see ``assign_msas_task``).
+        self.county_msas = dict(County.objects.values_list("uuid", "msa_id"))
+
+        coordinates = sum(index.coordinates for index in self.levels.values())
+        logger.info(
+            "Loaded region index for geometry version %s in %.1fs: %s; ~%.1f MB of coordinates",
+            version,
+            time.monotonic() - started,
+            ", ".join(f"{len(index.pieces)} {level} pieces" for level, index in self.levels.items()),
+            coordinates * 16 / 1024 / 1024,
+        )
+
+    def lookup_many(self, points):
+        """
+        Resolves an array of shapely points to ``{level: [(uuid, name) or None, ...]}``, in input order. Cities and
+        counties are found by testing the points; the MSA of a point inside a county is the county's precomputed
+        one, so only points outside every county are tested against the MSA pieces.
+        """
+        found = {level: self.levels[level].find_many(points) for level in ("city", "county")}
+
+        msas = np.array([self.county_msas.get(uuid) for uuid in found["county"]], dtype=object)
+        outside = np.array([uuid is None for uuid in found["county"]], dtype=bool)
+        if outside.any():
+            msas[outside] = self.levels["msa"].find_many(points[outside])
+        found["msa"] = msas
+
+        return {
+            level: [(uuid, index.names.get(uuid)) if uuid else None for uuid in found[level]]
+            for level, index in self.levels.items()
+        }
+
+    def lookup(self, lng, lat):
+        """
+        Returns ``{level: (uuid, name) or None}`` for the regions containing ``lng``/``lat``.
+        """
+        regions = self.lookup_many(shapely.points([[lng, lat]]))
+        return {level: matches[0] for level, matches in regions.items()}
+
+
+_current = {"index": None, "reloading": False}
+_lock = threading.Lock()
+
+
+def _reload(version):
+    try:
+        index = RegionIndex(version)
+        with _lock:
+            _current["index"] = index
+    except Exception:
+        logger.exception("Failed to reload the region index for geometry version %s", version)
+    finally:
+        with _lock:
+            _current["reloading"] = False
+        # This thread opened its own database connection.
+        connection.close()
+
+
+def get_region_index():
+    """
+    Returns this process' region index. The first call loads it; afterwards, a change of the geometry version
+    (which ``get_geometry_version`` checks at most every ``DATASET_VERSION_CHECK_INTERVAL`` seconds) starts a
+    rebuild in a background thread, and the current index keeps answering until the new one is swapped in.
+    """
+    version = get_geometry_version()
+    index = _current["index"]
+    if index is None:
+        with _lock:
+            if _current["index"] is None:
+                _current["index"] = RegionIndex(version)
+            return _current["index"]
+
+    if index.version != version:
+        with _lock:
+            start = not _current["reloading"]
+            _current["reloading"] = True
+        if start:
+            threading.Thread(target=_reload, args=(version,), name="region-index-reload", daemon=True).start()
+    return index
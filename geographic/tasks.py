@@ -1,215 +1,576 @@
 import glob
 import logging
 import os
-import tempfile
-import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from celery import shared_task
-
-from common.helpers import read_shapefile, geometry_to_multipolygon
-from geographic.helpers import update_model_population, fetch_census_population_data
-from geographic.models import State, County, City, MSA
+import geopandas as gpd
+import requests
+import shapely
+from celery import chord, shared_task
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+
+from census.client import CensusAPIClient
+from common.helpers import read_shapefile_batches, geometry_to_multipolygon, bulk_upsert, feature_hash, find_removed
+from geographic.cache import bump_dataset_version, bump_geometry_version
+from geographic.constants import (
+    IMPORT_BATCH_SIZE,
+    ZOOM_TOLERANCE,
+    SIMPLIFY_MAX_ZOOM,
+    SUBDIVIDE_MAX_VERTICES,
+    ENTITY_MODELS,
+    UNMATCHED_FIPS_SAMPLE_SIZE,
+)
+from geographic.helpers import (
+    update_model_population,
+    fetch_census_population_data,
+    load_geometry_frame,
+    find_containing,
+)
+from geographic.models import State, County, City, MSA, SimplifiedBoundary, BoundarySubdivision
 
 logger = logging.getLogger(__name__)
 
 
+def _build_entity(model_class, attributes, geometry):
+    """
+    Builds an unsaved ``model_class`` instance from source attributes and a shapely geometry,
+    stamping it with the content hash used to skip unchanged features on re-import.
+    """
+    boundary = geometry_to_multipolygon(geometry)
+    return model_class(
+        **attributes,
+        boundary=boundary,
+        centroid=boundary.centroid,
+        content_hash=feature_hash(attributes, geometry),
+        # Computed geodesically by the database once the entity is written (see ``_update_areas``).
+        area_sq_km=None,
+    )
+
+
+def _update_areas(model_class, unique_fields, keys):
+    """
+    Fills in ``area_sq_km`` for the entities with natural keys in ``keys`` whose boundary was written
+    without it, i.e. the new or changed entities of this import.
+    """
+    opts = model_class._meta
+    key_attnames = [opts.get_field(name).attname for name in unique_fields]
+    lookups = {f"{attname}__in": {key[i] for key in keys} for i, attname in enumerate(key_attnames)}
+    rows = model_class.objects.filter(area_sq_km__isnull=True, **lookups).values_list(*key_attnames, "pk")
+    pks = [str(row[-1]) for row in rows if row[:-1] in keys]
+    if not pks:
+        return 0
+
+    table = connection.ops.quote_name(opts.db_table)
+    pk_column = connection.ops.quote_name(opts.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} SET area_sq_km = ST_Area(boundary::geography) / 1e6
+            WHERE {pk_column} = ANY(%s::uuid[]) AND area_sq_km IS NULL AND boundary IS NOT NULL
+            """,
+            [pks],
+        )
+        return cursor.rowcount
+
+
+def _bump_versions_for(summary):
+    """
+    Moves the dataset and geometry versions forward if an import ``summary`` reports written or pruned entities.
+    """
+    if summary["added"] or summary["changed"] or summary["pruned"]:
+        bump_dataset_version()
+        bump_geometry_version()
+
+
+def _upsert_entities(model_class, objects, unique_fields, update_fields, scope=None, prune=False, bump_versions=True):
+    """
+    Writes new and changed ``objects`` and reports entities of ``scope`` (defaults to all rows)
+    that were not part of this import as removed, deleting them when ``prune`` is set. Fanned-out imports
+    pass ``bump_versions=False`` and bump the versions once from their aggregated summary instead.
+    """
+    seen_keys = set()
+    summary = bulk_upsert(
+        model_class,
+        objects,
+        unique_fields=unique_fields,
+        update_fields=[*update_fields, "boundary", "centroid", "content_hash", "area_sq_km"],
+        batch_size=IMPORT_BATCH_SIZE,
+        compare_field="content_hash",
+        seen_keys=seen_keys,
+    )
+
+    if scope is None:
+        scope = model_class.objects.all()
+    elif callable(scope):
+        scope = scope(seen_keys)
+    removed = find_removed(scope, unique_fields, seen_keys)
+    if removed and prune:
+        model_class.objects.filter(pk__in=removed).delete()
+    summary["removed"] = len(removed)
+    summary["pruned"] = len(removed) if prune else 0
+
+    if summary["added"] or summary["changed"]:
+        _update_areas(model_class, unique_fields, seen_keys)
+    if bump_versions:
+        _bump_versions_for(summary)
+    return summary
+
+
 @shared_task
-def import_msas_from_shapefile_task(shapefile_path="data/tl_2024_us_cbsa/tl_2024_us_cbsa.shp"):
+def import_msas_from_shapefile_task(shapefile_path="data/tl_2024_us_cbsa/tl_2024_us_cbsa.shp", prune=False):
     """
     Reads MSA shapefile and saves only Metropolitan Statistical Areas to the database.
     """
-    gdf = read_shapefile(shapefile_path)
-    if gdf is None:
+    batches = read_shapefile_batches(
+        shapefile_path, batch_size=IMPORT_BATCH_SIZE, columns=["CBSAFP", "NAME", "LSAD", "NAMELSAD", "GEOID"]
+    )
+    if batches is None:
         logger.error("Failed to read CBSA shapefile.")
         return
 
-    for _, row in gdf.iterrows():
-        geoid = row["GEOID"]
-        name = row["NAME"]
-        fips = row["CBSAFP"]
-        geometry = geometry_to_multipolygon(row.geometry)
-
-        msa, created = MSA.objects.update_or_create(
-            fips=fips,
-            defaults={
-                "name": name,
-                "lsad": row["LSAD"],
-                "namelsad": row["NAMELSAD"],
-                "geoid": row["GEOID"],
-                "boundary": geometry,
-                "centroid": geometry.centroid,
-            },
-        )
-        logger.info("%s MSA: %s (GEOID: %s)", "Created" if created else "Updated", name, geoid)
+    def build(row):
+        attributes = {
+            "fips": row.CBSAFP,
+            "name": row.NAME,
+            "lsad": row.LSAD,
+            "namelsad": row.NAMELSAD,
+            "geoid": row.GEOID,
+        }
+        return _build_entity(MSA, attributes, row.geometry)
+
+    summary = _upsert_entities(
+        MSA,
+        (build(row) for gdf in batches for row in gdf.itertuples(index=False)),
+        unique_fields=["fips"],
+        update_fields=["name", "lsad", "namelsad", "geoid"],
+        prune=prune,
+    )
+    logger.info("MSA import finished: %s", summary)
+    return summary
 
 
 @shared_task
-def import_states_from_shapefile_task(shapefile_path="data/tl_2024_us_state/tl_2024_us_state.shp"):
+def import_states_from_shapefile_task(shapefile_path="data/tl_2024_us_state/tl_2024_us_state.shp", prune=False):
     """
     Reads state shapefile and saves state records to the database.
     """
-    gdf = read_shapefile(shapefile_path)
-    if gdf is None:
+    batches = read_shapefile_batches(
+        shapefile_path, batch_size=IMPORT_BATCH_SIZE, columns=["STATEFP", "NAME", "STUSPS", "GEOID"]
+    )
+    if batches is None:
         logger.error("Failed to read state shapefile.")
         return
 
-    for _, row in gdf.iterrows():
-        name = row["NAME"]
-        abbreviation = row["STUSPS"]
-        fips = row["STATEFP"]
-        geometry = geometry_to_multipolygon(row.geometry)
-
-        state, created = State.objects.update_or_create(
-            fips=fips,
-            defaults={
-                "name": name,
-                "geoid": row["GEOID"],
-                "abbreviation": abbreviation,
-                "boundary": geometry,
-                "centroid": geometry.centroid,
-            },
-        )
-        logger.info("%s state: %s (%s), FIPS: %s", "Created" if created else "Updated", name, abbreviation, fips)
+    def build(row):
+        attributes = {
+            "fips": row.STATEFP,
+            "name": row.NAME,
+            "geoid": row.GEOID,
+            "abbreviation": row.STUSPS,
+        }
+        return _build_entity(State, attributes, row.geometry)
+
+    summary = _upsert_entities(
+        State,
+        (build(row) for gdf in batches for row in gdf.itertuples(index=False)),
+        unique_fields=["fips"],
+        update_fields=["name", "geoid", "abbreviation"],
+        prune=prune,
+    )
+    logger.info("State import finished: %s", summary)
+    return summary
 
 
 @shared_task
-def import_counties_from_shapefile_task(shapefile_path="data/tl_2024_us_county/tl_2024_us_county.shp"):
+def import_counties_from_shapefile_task(shapefile_path="data/tl_2024_us_county/tl_2024_us_county.shp", prune=False):
     """
     Reads county shapefile and saves county records to the database, linking them to states.
     """
-    gdf = read_shapefile(shapefile_path)
-    if gdf is None:
+    batches = read_shapefile_batches(
+        shapefile_path, batch_size=IMPORT_BATCH_SIZE, columns=["STATEFP", "COUNTYFP", "NAME", "NAMELSAD", "GEOID"]
+    )
+    if batches is None:
         logger.error("Failed to read county shapefile.")
         return
 
-    for _, row in gdf.iterrows():
-        name = row["NAME"]
-        state_fips = row["STATEFP"]
-        county_fips = row["COUNTYFP"]
-        geometry = geometry_to_multipolygon(row.geometry)
+    state_ids = dict(State.objects.values_list("fips", "uuid"))
+
+    def build_all():
+        for gdf in batches:
+            for row in gdf.itertuples(index=False):
+                state_id = state_ids.get(row.STATEFP)
+                if not state_id:
+                    logger.error("State with FIPS %s not found. Skipping county %s.", row.STATEFP, row.NAME)
+                    continue
+
+                attributes = {
+                    "fips": row.COUNTYFP,
+                    "state_id": state_id,
+                    "name": row.NAME,
+                    "namelsad": row.NAMELSAD,
+                    "geoid": row.GEOID,
+                }
+                yield _build_entity(County, attributes, row.geometry)
+
+    summary = _upsert_entities(
+        County,
+        build_all(),
+        unique_fields=["state", "fips"],
+        update_fields=["name", "namelsad", "geoid"],
+        prune=prune,
+    )
+    logger.info("County import finished: %s", summary)
+    return summary
 
-        state = State.objects.filter(fips=state_fips).first()
-        if not state:
-            logger.error("State with FIPS %s not found. Skipping county %s.", state_fips, name)
-            continue
 
-        county, created = County.objects.update_or_create(
-            fips=county_fips,
-            state=state,
-            defaults={
-                "name": name,
-                "namelsad": row["NAMELSAD"],
-                "geoid": row["GEOID"],
-                "boundary": geometry,
-                "centroid": geometry.centroid,
-            },
-        )
-        print(f"{'Created' if created else 'Updated'} county: {name}, FIPS: {county_fips}")
+@shared_task
+def import_cities_from_place_zip_task(zip_path, prune=False, bump_versions=True):
+    """
+    Reads city data from a single zipped place shapefile and saves city records to the database.
+    The archive is read in place through GDAL's /vsizip/ handler, so nothing is extracted to disk.
+    Only includes cities (LSAD = '25').
+    """
+    # 🔽 Only include rows where LSAD == '25' (i.e., cities)
+    batches = read_shapefile_batches(
+        f"/vsizip/{os.path.abspath(zip_path)}",
+        batch_size=IMPORT_BATCH_SIZE,
+        columns=["STATEFP", "PLACEFP", "NAME", "NAMELSAD", "GEOID", "LSAD"],
+        where="LSAD = '25'",
+    )
+    if batches is None:
+        logger.error("Failed to read shapefile: %s", zip_path)
+        return
+
+    state_ids = dict(State.objects.values_list("fips", "uuid"))
+    county_frames = {}
+    without_county = 0
+
+    def build_all():
+        nonlocal without_county
+        for gdf in batches:
+            for state_fips, state_cities in gdf.groupby("STATEFP"):
+                state_id = state_ids.get(state_fips)
+                if not state_id:
+                    logger.error("State with FIPS %s not found. Skipping %d cities.", state_fips, len(state_cities))
+                    continue
+
+                # Resolve every city's county with one in-memory spatial join instead of a query per city.
+                # Geometries are stored as-is with SRID 4326, so label the centroids the same way.
+                if state_id not in county_frames:
+                    county_frames[state_id] = load_geometry_frame(County.objects.filter(state_id=state_id))
+                counties = county_frames[state_id]
+                centroids = gpd.GeoSeries(
+                    shapely.centroid(state_cities.geometry.values), index=state_cities.index, crs=counties.crs
+                )
+                county_ids = find_containing(centroids, counties)
+                without_county += len(state_cities) - len(county_ids)
+
+                for index, row in zip(state_cities.index, state_cities.itertuples(index=False)):
+                    attributes = {
+                        "fips": row.PLACEFP,
+                        "state_id": state_id,
+                        "county_id": county_ids.get(index),
+                        "name": row.NAME,
+                        "namelsad": row.NAMELSAD,
+                        "geoid": row.GEOID,
+                    }
+                    city = _build_entity(City, attributes, row.geometry)
+                    city.centroid_geography = city.centroid
+                    yield city
+
+    summary = _upsert_entities(
+        City,
+        build_all(),
+        unique_fields=["state", "fips"],
+        update_fields=["name", "namelsad", "geoid", "county", "centroid_geography"],
+        # Only cities of the states present in this archive can have been removed from it.
+        scope=lambda seen_keys: City.objects.filter(state_id__in={state_id for state_id, _ in seen_keys}),
+        prune=prune,
+        bump_versions=bump_versions,
+    )
+    summary["without_county"] = without_county
+    logger.info("City import finished for %s: %s", zip_path, summary)
+    return summary
 
 
 @shared_task
-def import_cities_from_place_zips_task(places_directory="data/places"):
+def aggregate_import_summaries_task(summaries):
     """
-    Reads city data from zipped shapefiles in the provided directory and saves city records to the database.
-    Only includes cities (LSAD = '25').
+    Sums the per-file summaries returned by fanned-out import subtasks into a single summary and bumps the
+    dataset and geometry versions once for all of them. Subtasks that failed to read their input return ``None``
+    and are counted as ``failed``.
     """
-    zip_files = glob.glob(os.path.join(places_directory, "tl_2024_*_place.zip"))
+    total = {"failed": 0}
+    for summary in summaries:
+        if summary is None:
+            total["failed"] += 1
+            continue
+        for key, value in summary.items():
+            total[key] = total.get(key, 0) + value
+
+    logger.info("Import finished across %d files: %s", len(summaries), total)
+    _bump_versions_for({"added": 0, "changed": 0, "pruned": 0, **total})
+    return total
+
+
+@shared_task(bind=True)
+def import_cities_from_place_zips_task(self, places_directory="data/places", prune=False):
+    """
+    Fans out one ``import_cities_from_place_zip_task`` per state ZIP in the provided directory so that
+    states are decompressed and parsed in parallel across Celery workers. The per-state summaries are
+    aggregated by a chord callback, which takes over this task's id and result.
+    """
+    zip_files = sorted(glob.glob(os.path.join(places_directory, "tl_2024_*_place.zip")))
     if not zip_files:
         logger.error("No city ZIP files found in %s", places_directory)
         return
 
-    for zip_path in zip_files:
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(tmpdirname)
+    logger.info("Importing cities from %d place ZIP files", len(zip_files))
+    return self.replace(
+        chord(
+            [
+                import_cities_from_place_zip_task.si(zip_path, prune=prune, bump_versions=False)
+                for zip_path in zip_files
+            ],
+            aggregate_import_summaries_task.s(),
+        )
+    )
 
-            shp_files = glob.glob(os.path.join(tmpdirname, "*.shp"))
-            if not shp_files:
-                logger.error("No shapefile found in %s", zip_path)
-                continue
 
-            shapefile_path = shp_files[0]
-            gdf = read_shapefile(shapefile_path)
+def _rebuild_simplified_boundaries(model_class):
+    """
+    Brings the precomputed ``SimplifiedBoundary`` rows of ``model_class`` in line with its current
+    boundaries: rows whose entity changed (by content hash) or whose band is gone or retuned are
+    dropped, then every missing (entity, band) pair is simplified in one statement per band.
+    """
+    content_type = ContentType.objects.get_for_model(model_class)
+    bands = {zoom: tolerance for zoom, tolerance in ZOOM_TOLERANCE.items() if zoom < SIMPLIFY_MAX_ZOOM}
+    entity_table = connection.ops.quote_name(model_class._meta.db_table)
+    simplified_table = connection.ops.quote_name(SimplifiedBoundary._meta.db_table)
+    summary = {"deleted": 0, "created": 0}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {simplified_table} s
+            WHERE s.content_type_id = %s
+              AND NOT EXISTS (
+                SELECT 1 FROM {entity_table} e
+                WHERE e.uuid = s.object_id AND e.content_hash IS NOT DISTINCT FROM s.source_hash
+              )
+            """,
+            [content_type.id],
+        )
+        summary["deleted"] += cursor.rowcount
 
-        if gdf is None:
-            logger.error("Failed to read shapefile: %s", shapefile_path)
-            continue
+        cursor.execute(
+            f"DELETE FROM {simplified_table} WHERE content_type_id = %s AND zoom <> ALL(%s)",
+            [content_type.id, list(bands)],
+        )
+        summary["deleted"] += cursor.rowcount
 
-        # 🔽 Only include rows where LSAD == '25' (i.e., cities)
-        cities_only = gdf[gdf["LSAD"] == "25"]
-
-        for _, row in cities_only.iterrows():
-            name = row.get("NAME")
-            geometry = geometry_to_multipolygon(row.geometry)
-
-            try:
-                state = State.objects.get(fips=row.get("STATEFP"))
-            except State.DoesNotExist:
-                logger.error("State with FIPS %s not found. Skipping city %s.", row.get("STATEFP"), name)
-                continue
-
-            county = County.objects.filter(boundary__contains=geometry.centroid, state=state).first()
-
-            city, created = City.objects.update_or_create(
-                name=name,
-                state=state,
-                fips=row["PLACEFP"],
-                defaults={
-                    "county": county,
-                    "boundary": geometry,
-                    "geoid": row["GEOID"],
-                    "namelsad": row["NAMELSAD"],
-                    "centroid": geometry.centroid,
-                },
+        for zoom, tolerance in bands.items():
+            cursor.execute(
+                f"DELETE FROM {simplified_table} WHERE content_type_id = %s AND zoom = %s AND tolerance <> %s",
+                [content_type.id, zoom, tolerance],
             )
-
-            county_info = f", County: {county.name}" if county else ""
-            logger.info(
-                "%s city: %s, State: %s%s", "Created" if created else "Updated", name, state.abbreviation, county_info
+            summary["deleted"] += cursor.rowcount
+
+            cursor.execute(
+                f"""
+                INSERT INTO {simplified_table}
+                    (uuid, created_at, updated_at, content_type_id, object_id, zoom, tolerance, source_hash, boundary)
+                SELECT gen_random_uuid(), now(), now(), %s, e.uuid, %s, %s, e.content_hash,
+                       ST_Multi(ST_SimplifyPreserveTopology(e.boundary, %s))
+                FROM {entity_table} e
+                WHERE e.boundary IS NOT NULL
+                  AND NOT EXISTS (
+                    SELECT 1 FROM {simplified_table} s
+                    WHERE s.content_type_id = %s AND s.object_id = e.uuid AND s.zoom = %s
+                  )
+                """,
+                [content_type.id, zoom, tolerance, tolerance, content_type.id, zoom],
             )
+            summary["created"] += cursor.rowcount
+
+    return summary
 
 
-def update_population_threaded(model_class, level: str, fips_field: str):
+@shared_task
+def rebuild_simplified_boundaries_task(entity_type=None):
     """
-    Generic threaded function to fetch and update population for counties or cities.
-    Iterates over all states and updates the population for the provided model.
+    Precomputes the simplified boundaries served by the boundaries endpoint for every ``ZOOM_TOLERANCE``
+    band below ``SIMPLIFY_MAX_ZOOM``. Only new or changed entities are re-simplified, so it is cheap to
+    run after every import. Rebuilds all entity types unless ``entity_type`` is given.
     """
-    states = list(State.objects.all())
-    failed_states = []
+    entity_types = [entity_type] if entity_type else list(ENTITY_MODELS)
+    summary = {}
+    for name in entity_types:
+        summary[name] = _rebuild_simplified_boundaries(ENTITY_MODELS[name])
+        logger.info("Rebuilt simplified %s boundaries: %s", name, summary[name])
 
-    def process_state(state):
-        try:
-            df = fetch_census_population_data(level, state_fips=state.fips)
-            update_model_population(df, model_class, fips_field=fips_field, state_filter=True)
-        except Exception as e:
-            logger.error("❌ Failed for %s: %s", state.name, e)
-            failed_states.append(state.fips)
+    if any(counts["deleted"] or counts["created"] for counts in summary.values()):
+        bump_dataset_version()
+    return summary
 
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        futures = [executor.submit(process_state, state) for state in states]
-        for future in as_completed(futures):
-            # This will re-raise exceptions (if any) that haven't been caught in process_state.
-            try:
-                future.result()
-            except Exception:
-                # Exceptions are already logged in process_state, so we can safely pass here.
-                pass
 
-    return failed_states
+def _rebuild_boundary_subdivisions(model_class):
+    """
+    Brings the ``BoundarySubdivision`` pieces of ``model_class`` in line with its current boundaries: pieces of
+    entities that changed (by content hash) or no longer exist are dropped, then every entity without pieces is
+    cut with ``ST_Subdivide`` in one statement.
+    """
+    content_type = ContentType.objects.get_for_model(model_class)
+    entity_table = connection.ops.quote_name(model_class._meta.db_table)
+    pieces_table = connection.ops.quote_name(BoundarySubdivision._meta.db_table)
+    summary = {}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {pieces_table} p
+            WHERE p.content_type_id = %s
+              AND NOT EXISTS (
+                SELECT 1 FROM {entity_table} e
+                WHERE e.uuid = p.object_id AND e.content_hash IS NOT DISTINCT FROM p.source_hash
+              )
+            """,
+            [content_type.id],
+        )
+        summary["deleted"] = cursor.rowcount
+
+        cursor.execute(
+            f"""
+            INSERT INTO {pieces_table} (uuid, created_at, updated_at, content_type_id, object_id, source_hash, piece)
+            SELECT gen_random_uuid(), now(), now(), %s, e.uuid, e.content_hash, ST_Subdivide(e.boundary, %s)
+            FROM {entity_table} e
+            WHERE e.boundary IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {pieces_table} p WHERE p.content_type_id = %s AND p.object_id = e.uuid)
+            """,
+            [content_type.id, SUBDIVIDE_MAX_VERTICES, content_type.id],
+        )
+        summary["created"] = cursor.rowcount
+
+    return summary
+
+
+@shared_task
+def rebuild_boundary_subdivisions_task(entity_type=None):
+    """
+    Maintains the subdivided boundary pieces the spatial endpoints query through. Only new or changed entities
+    are subdivided again. Rebuilds all entity types unless ``entity_type`` is given.
+    """
+    entity_types = [entity_type] if entity_type else list(ENTITY_MODELS)
+    summary = {}
+    for name in entity_types:
+        summary[name] = _rebuild_boundary_subdivisions(ENTITY_MODELS[name])
+        logger.info("Rebuilt %s boundary subdivisions: %s", name, summary[name])
+
+    if any(counts["deleted"] or counts["created"] for counts in summary.values()):
+        bump_dataset_version()
+        bump_geometry_version()
+    return summary
+
+
+def _assign_msas():
+    """
+    Stores every county's MSA, the one containing a point on the county's surface. Only counties whose
+    membership changed are written. Returns the number of updated counties.
+    """
+    msa_table = connection.ops.quote_name(MSA._meta.db_table)
+    county_table = connection.ops.quote_name(County._meta.db_table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {county_table} c SET msa_id = membership.msa_id
+            FROM (
+                SELECT county.uuid, (
+                    SELECT m.uuid FROM {msa_table} m
+                    WHERE ST_Intersects(m.boundary, ST_PointOnSurface(county.boundary))
+                    LIMIT 1
+                ) AS msa_id
+                FROM {county_table} county
+            ) membership
+            WHERE c.uuid = membership.uuid AND c.msa_id IS DISTINCT FROM membership.msa_id
+            """
+        )
+        return cursor.rowcount
+
+
+@shared_task
+def assign_msas_task():
+    """
+    Precomputes County MSA membership once counties and MSAs have been imported. The region index resolves
+    the MSA of a point through the county containing it, instead of testing MSA polygons.
+    """
+    summary = {"counties": _assign_msas()}
+    logger.info("Assigned MSA memberships: %s", summary)
+
+    if summary["counties"]:
+        bump_dataset_version()
+        bump_geometry_version()
+    return summary
+
+
+def update_population_for_level(model_class, level: str, fips_field: str):
+    """
+    Fetches and updates population for counties or cities. The whole country is fetched with one
+    national-scope Census API request; if that fails, it falls back to one request per state, issued
+    concurrently over the client's connection pool.
+    Returns the matched/updated/unmatched counts with a sample of unmatched FIPS codes, the FIPS codes of
+    failed states and API latency metrics.
+    """
+    with CensusAPIClient() as client:
+        try:
+            df = fetch_census_population_data(level, client=client)
+            summary = update_model_population(df, model_class, fips_field=fips_field, state_filter=True)
+            summary["failed_states"] = []
+        except requests.RequestException as e:
+            logger.warning("National %s query failed (%s); falling back to per-state queries.", level, e)
+            summary = {"matched": 0, "updated": 0, "unmatched_count": 0, "unmatched_sample": [], "failed_states": []}
+
+            states = dict(State.objects.values_list("fips", "name"))
+            queries = [(["NAME", "P1_001N"], f"{level}:*", f"state:{fips}") for fips in states]
+            for (_, _, in_clause), result in client.get_many(queries):
+                state_fips = in_clause.split(":")[1]
+                if isinstance(result, Exception):
+                    logger.error("❌ Failed for %s: %s", states[state_fips], result)
+                    summary["failed_states"].append(state_fips)
+                    continue
+
+                state_summary = update_model_population(result, model_class, fips_field=fips_field, state_filter=True)
+                summary["matched"] += state_summary["matched"]
+                summary["updated"] += state_summary["updated"]
+                summary["unmatched_count"] += state_summary["unmatched_count"]
+                sample = summary["unmatched_sample"] + state_summary["unmatched_sample"]
+                summary["unmatched_sample"] = sample[:UNMATCHED_FIPS_SAMPLE_SIZE]
+
+        summary["census_api"] = client.metrics
+
+    logger.info("Census API metrics for %s population: %s", level, summary["census_api"])
+    if summary["updated"]:
+        bump_dataset_version()
+    return summary
 
 
 @shared_task
 def update_populations_for_states_task():
-    df = fetch_census_population_data("state")
-    update_model_population(df, State, fips_field="state", state_filter=False)
+    with CensusAPIClient() as client:
+        df = fetch_census_population_data("state", client=client)
+        summary = update_model_population(df, State, fips_field="state", state_filter=False)
+        summary["census_api"] = client.metrics
+
+    if summary["updated"]:
+        bump_dataset_version()
+    return summary
 
 
 @shared_task
 def update_populations_for_counties_task():
-    return update_population_threaded(County, level="county", fips_field="county")
+    return update_population_for_level(County, level="county", fips_field="county")
 
 
 @shared_task
 def update_populations_for_cities_task():
-    return update_population_threaded(City, level="place", fips_field="place")
+    return update_population_for_level(City, level="place", fips_field="place")
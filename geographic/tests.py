@@ -1 +1,552 @@
-# Create your tests here.
+import json
+import math
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import requests
+import shapely
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from census.models import CensusPopulation, CensusProfile, CensusSocioEconomicProfile
+from common.helpers import encode_cursor
+from geographic import spatial_index, tasks
+from geographic.constants import (
+    MAX_TOPOJSON_PRECISION,
+    QUERY_POLYGON_MAX_AREA_SQ_KM,
+    QUERY_POLYGON_MAX_VERTICES,
+    UNMATCHED_FIPS_SAMPLE_SIZE,
+)
+from geographic.helpers import (
+    WGS84,
+    get_bbox_tiles,
+    lng_lat_to_tile,
+    parse_query_polygon,
+    tile_bounds,
+    update_model_population,
+)
+from geographic.models import BoundarySubdivision, County, State
+from geographic.tasks import _build_entity, _upsert_entities
+from geographic.topojson import encode_topology
+from geographic.views import AggregateByPolygonAPIView, BoundariesAPIView, NearbyCitiesAPIView
+
+
+class TileGridTests(SimpleTestCase):
+    def test_lng_lat_to_tile(self):
+        self.assertEqual(lng_lat_to_tile(0, 0, 0), (0, 0))
+        self.assertEqual(lng_lat_to_tile(-0.1, 0.1, 1), (0, 0))
+        self.assertEqual(lng_lat_to_tile(0.1, -0.1, 1), (1, 1))
+
+    def test_lng_lat_to_tile_matches_tile_bounds(self):
+        for lng, lat, z in [(-73.9857, 40.7484, 10), (-122.4194, 37.7749, 14), (151.2093, -33.8688, 7)]:
+            min_lng, min_lat, max_lng, max_lat = tile_bounds(z, *lng_lat_to_tile(lng, lat, z))
+            self.assertTrue(min_lng <= lng < max_lng and min_lat < lat <= max_lat)
+
+    def test_lng_lat_to_tile_clamps_to_the_grid(self):
+        self.assertEqual(lng_lat_to_tile(180, -90, 2), (3, 3))
+        self.assertEqual(lng_lat_to_tile(-180, 90, 2), (0, 0))
+        self.assertEqual(lng_lat_to_tile(-200, 89.9, 3), (0, 0))
+
+    def test_get_bbox_tiles_covers_the_bbox(self):
+        z, tiles = get_bbox_tiles((-0.1, -0.1, 0.1, 0.1), 1, max_tiles=4)
+        self.assertEqual(z, 1)
+        self.assertEqual(sorted(tiles), [(0, 0), (0, 1), (1, 0), (1, 1)])
+
+    def test_get_bbox_tiles_coarsens_until_it_fits(self):
+        z, tiles = get_bbox_tiles((-0.1, -0.1, 0.1, 0.1), 8, max_tiles=1)
+        self.assertEqual((z, tiles), (0, [(0, 0)]))
+
+        z, tiles = get_bbox_tiles((-74.0, 40.7, -73.9, 40.8), 16, max_tiles=4)
+        self.assertLess(z, 16)
+        self.assertLessEqual(len(tiles), 4)
+
+
+class BoundariesValidationTests(SimpleTestCase):
+    def get(self, **params):
+        request = RequestFactory().get("/api/boundaries/", {"type": "county", "bbox": "-75,40,-73,41", **params})
+        return BoundariesAPIView.as_view()(request)
+
+    def test_rejects_non_finite_zoom(self):
+        for zoom in ("nan", "inf", "-inf"):
+            self.assertEqual(self.get(zoom=zoom).status_code, 400)
+
+    def test_caps_topojson_precision(self):
+        response = self.get(format="topojson", precision=str(MAX_TOPOJSON_PRECISION + 1))
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_non_finite_bbox(self):
+        for bbox in ("nan,40,-73,41", "-75,40,inf,41", "-inf,-inf,0,0"):
+            self.assertEqual(self.get(bbox=bbox).status_code, 400)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class BoundariesRevalidationTests(SimpleTestCase):
+    def get(self, etag, **params):
+        request = RequestFactory().get(
+            "/api/boundaries/", {"type": "county", "bbox": "-75,40,-73,41", **params}, HTTP_IF_NONE_MATCH=etag
+        )
+        with mock.patch("geographic.views.get_dataset_version", return_value=7):
+            return BoundariesAPIView.as_view()(request)
+
+    def test_not_modified_responses_vary_on_accept(self):
+        response = self.get('W/"county-json-7"', format="json")
+
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("Accept", response["Vary"])
+
+    def test_etags_differ_by_format(self):
+        # A GeoJSON ETag must not revalidate a TopoJSON request.
+        with mock.patch.object(BoundariesAPIView, "render_body", return_value="{}"):
+            response = self.get('W/"county-json-7"', format="topojson")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], 'W/"county-topojson-7"')
+        self.assertIn("Accept", response["Vary"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+
+class QueryPolygonTests(SimpleTestCase):
+    def polygon(self, min_lng, min_lat, max_lng, max_lat):
+        ring = [[min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat]]
+        return {"type": "Polygon", "coordinates": [ring]}
+
+    def test_accepts_polygons_and_json_strings(self):
+        geojson = self.polygon(-74.1, 40.6, -73.9, 40.8)
+        self.assertEqual(parse_query_polygon(geojson).geom_type, "Polygon")
+        self.assertEqual(parse_query_polygon(json.dumps(geojson)).srid, 4326)
+
+        multi = {
+            "type": "MultiPolygon",
+            "coordinates": [geojson["coordinates"], self.polygon(0, 0, 1, 1)["coordinates"]],
+        }
+        self.assertEqual(parse_query_polygon(multi).geom_type, "MultiPolygon")
+
+    def test_rejects_malformed_and_non_polygonal_input(self):
+        invalid = [
+            "not json",
+            "[1, 2]",
+            {"type": "Polygon", "coordinates": "nope"},
+            {"type": "Point", "coordinates": [0, 0]},
+            # A self-intersecting bow tie.
+            {"type": "Polygon", "coordinates": [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]},
+        ]
+        for geojson in invalid:
+            with self.assertRaises(ValueError, msg=geojson):
+                parse_query_polygon(geojson)
+
+    def test_caps_vertices(self):
+        circle = shapely.Point(-74, 40.7).buffer(0.1, quad_segs=QUERY_POLYGON_MAX_VERTICES // 4 + 1)
+        with self.assertRaisesMessage(ValueError, "vertices"):
+            parse_query_polygon(shapely.geometry.mapping(circle))
+
+    def test_caps_the_geodesic_area(self):
+        # About 111 km per degree of latitude, and less per degree of longitude away from the equator.
+        side = math.sqrt(QUERY_POLYGON_MAX_AREA_SQ_KM) / 111
+        parse_query_polygon(self.polygon(0, 0, side * 0.9, side * 0.9))
+        with self.assertRaisesMessage(ValueError, "km²"):
+            parse_query_polygon(self.polygon(0, 0, side * 1.1, side * 1.1))
+
+        # The same extent in degrees covers less ground at high latitudes, and winding does not change the area.
+        north = self.polygon(0, 50, side * 1.1, 50 + side * 1.1)
+        north["coordinates"][0].reverse()
+        parse_query_polygon(north)
+
+
+class NearbyCitiesValidationTests(SimpleTestCase):
+    def get(self, **params):
+        request = RequestFactory().get("/api/cities/nearby/", {"lat": "40.7", "lng": "-74.0", **params})
+        return NearbyCitiesAPIView.as_view()(request)
+
+    def test_rejects_invalid_coordinates(self):
+        for coordinates in ({"lat": "nan"}, {"lng": "inf"}, {"lat": "90.5"}, {"lng": "-180.5"}, {"lat": ""}):
+            self.assertEqual(self.get(**coordinates).status_code, 400, coordinates)
+
+    def test_rejects_invalid_radius(self):
+        for radius in ("0", "-5", "nan", "inf"):
+            self.assertEqual(self.get(radius=radius).status_code, 400, radius)
+
+    def test_rejects_cursors_with_values_of_the_wrong_type(self):
+        for values in ({"distance": {}, "uuid": "x"}, {"distance": 1.0, "uuid": ["x"]}, {"uuid": "x"}):
+            self.assertEqual(self.get(cursor=encode_cursor(values)).status_code, 400, values)
+
+
+def decode_topology(topology, object_name):
+    """
+    Decodes a topology produced by ``encode_topology`` back into ``{id: [[ring, ...], ...]}``, where every ring is
+    an open list of ``(x, y)`` tuples.
+    """
+    (scale_x, scale_y), (translate_x, translate_y) = topology["transform"]["scale"], topology["transform"]["translate"]
+    arcs = []
+    for arc in topology["arcs"]:
+        x = y = 0
+        points = []
+        for dx, dy in arc:
+            x, y = x + dx, y + dy
+            points.append((x * scale_x + translate_x, y * scale_y + translate_y))
+        arcs.append(points)
+
+    def ring(arc_ids):
+        points = []
+        for arc_id in arc_ids:
+            arc = arcs[arc_id] if arc_id >= 0 else arcs[~arc_id][::-1]
+            points.extend(arc[1:] if points else arc)
+        return points[:-1]
+
+    return {
+        geometry["id"]: [[ring(arc_ids) for arc_ids in polygon] for polygon in geometry["arcs"]]
+        for geometry in topology["objects"][object_name]["geometries"]
+    }
+
+
+def normalize_ring(ring, precision):
+    """
+    Rounds an open or closed ring and rotates it to start at its smallest point, keeping its winding.
+    """
+    points = [(round(x, precision), round(y, precision)) for x, y in ring]
+    if points[0] == points[-1]:
+        points.pop()
+    start = points.index(min(points))
+    return points[start:] + points[:start]
+
+
+class TopologyTests(SimpleTestCase):
+    precision = 6
+
+    def feature(self, feature_id, *polygons):
+        return {
+            "type": "Feature",
+            "id": feature_id,
+            "properties": {"name": feature_id},
+            "geometry": {"type": "MultiPolygon", "coordinates": [list(polygon) for polygon in polygons]},
+        }
+
+    def assert_round_trip(self, features):
+        topology = encode_topology(features, "counties", self.precision)
+        decoded = decode_topology(topology, "counties")
+
+        self.assertEqual(set(decoded), {feature["id"] for feature in features})
+        for feature in features:
+            expected = [
+                [normalize_ring(ring, self.precision) for ring in polygon]
+                for polygon in feature["geometry"]["coordinates"]
+            ]
+            actual = [[normalize_ring(ring, self.precision) for ring in polygon] for polygon in decoded[feature["id"]]]
+            self.assertEqual(actual, expected)
+        return topology
+
+    def test_shared_border_with_opposite_windings(self):
+        # West is wound counter-clockwise and east clockwise, so both walk their shared edge in the same direction.
+        west = [[(-74.5, 40.0), (-73.987654, 40.0), (-73.987654, 40.123456), (-73.987654, 40.5), (-74.5, 40.5)]]
+        east = [[(-73.987654, 40.0), (-73.987654, 40.123456), (-73.987654, 40.5), (-73.5, 40.5), (-73.5, 40.0)]]
+        topology = self.assert_round_trip([self.feature("west", west), self.feature("east", east)])
+
+        # The shared edge is one arc referenced by both features.
+        west_arcs, east_arcs = (
+            {arc if arc >= 0 else ~arc for arc in geometry["arcs"][0][0]}
+            for geometry in topology["objects"]["counties"]["geometries"]
+        )
+        self.assertEqual(len(west_arcs & east_arcs), 1)
+        self.assertEqual(len(topology["arcs"]), 3)
+
+    def test_shared_border_with_the_same_winding(self):
+        west = [[(0.0, 0.0), (1.0, 0.0), (1.0, 0.5), (1.0, 1.0), (0.0, 1.0)]]
+        east = [[(1.0, 0.0), (2.0, 0.0), (2.0, 1.0), (1.0, 1.0), (1.0, 0.5)]]
+        topology = self.assert_round_trip([self.feature("west", west), self.feature("east", east)])
+        self.assertEqual(len(topology["arcs"]), 3)
+
+    def test_holes_and_islands(self):
+        mainland = [
+            [(0.0, 0.0), (4.0, 0.0), (4.0, 4.0), (0.0, 4.0)],
+            [(1.0, 1.0), (1.0, 2.0), (2.0, 2.0), (2.0, 1.0)],
+        ]
+        island = [[(5.0, 5.0), (6.0, 5.0), (6.0, 6.0), (5.0, 6.0)]]
+        lake_county = [[(1.0, 1.0), (2.0, 1.0), (2.0, 2.0), (1.0, 2.0)]]
+        self.assert_round_trip([self.feature("mainland", mainland, island), self.feature("lake", lake_county)])
+
+    def test_quantized_coordinates_stay_exact_in_javascript(self):
+        world = [[(-180.0, -85.0), (180.0, -85.0), (180.0, 85.0), (-180.0, 85.0)]]
+        topology = encode_topology([self.feature("world", world)], "counties", MAX_TOPOJSON_PRECISION)
+        self.assertTrue(all(abs(value) < 2**53 for arc in topology["arcs"] for point in arc for value in point))
+
+
+class RegionIndexReloadTests(SimpleTestCase):
+    def setUp(self):
+        self.version = 1
+        self.built = []
+        self.release = threading.Event()
+        self.release.set()
+
+        def build(version):
+            self.release.wait(5)
+            index = mock.Mock(version=version)
+            self.built.append(index)
+            return index
+
+        patches = [
+            mock.patch.object(spatial_index, "RegionIndex", side_effect=build),
+            mock.patch.object(spatial_index, "get_geometry_version", side_effect=lambda: self.version),
+            mock.patch.dict(spatial_index._current, {"index": None, "reloading": False}),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def wait_for_reload(self):
+        for thread in threading.enumerate():
+            if thread.name == "region-index-reload":
+                thread.join(5)
+
+    def test_first_call_loads_the_index(self):
+        index = spatial_index.get_region_index()
+        self.assertEqual(index.version, 1)
+        self.assertIs(spatial_index.get_region_index(), index)
+        self.assertEqual(len(self.built), 1)
+
+    def test_version_change_reloads_in_the_background(self):
+        old = spatial_index.get_region_index()
+        self.version = 2
+        self.release.clear()
+
+        # The old index keeps answering, and only one rebuild starts, while the new one is built.
+        self.assertIs(spatial_index.get_region_index(), old)
+        self.assertIs(spatial_index.get_region_index(), old)
+
+        self.release.set()
+        self.wait_for_reload()
+        self.assertEqual(spatial_index.get_region_index().version, 2)
+        self.assertEqual([index.version for index in self.built], [1, 2])
+
+
+class RegionLookupTests(SimpleTestCase):
+    # A city spanning two counties; only the west county belongs to an MSA. The MSA also has a piece beyond
+    # both counties (e.g. offshore), which only points outside every county are tested against.
+    pieces = {
+        "city": [("city", "POLYGON((0 0, 2 0, 2 1, 0 1, 0 0))")],
+        "county": [
+            ("west", "POLYGON((-1 -1, 1 -1, 1 2, -1 2, -1 -1))"),
+            ("east", "POLYGON((1 -1, 3 -1, 3 2, 1 2, 1 -1))"),
+        ],
+        "msa": [
+            ("metro", "POLYGON((-1 -1, 1 -1, 1 2, -1 2, -1 -1))"),
+            ("metro", "POLYGON((-5 -1, -1 -1, -1 2, -5 2, -5 -1))"),
+        ],
+    }
+
+    def setUp(self):
+        levels = {model: level for level, model in spatial_index.REGION_LEVELS.items()}
+
+        def load(index, model):
+            owners, wkts = zip(*self.pieces[levels[model]])
+            index.owners = np.array(owners, dtype=object)
+            index.pieces = shapely.from_wkt(list(wkts))
+            shapely.prepare(index.pieces)
+            index.tree = shapely.STRtree(index.pieces)
+            index.names = {owner: owner.title() for owner in owners}
+            index.coordinates = int(shapely.get_num_coordinates(index.pieces).sum())
+
+        patches = [
+            mock.patch.object(spatial_index.LevelIndex, "__init__", autospec=True, side_effect=load),
+            mock.patch.object(spatial_index.County, "objects", mock.Mock()),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        spatial_index.County.objects.values_list.return_value = [("west", "metro"), ("east", None)]
+        self.index = spatial_index.RegionIndex(version=1)
+
+    def test_counties_are_tested_per_point_and_msas_follow_them(self):
+        regions = self.index.lookup_many(shapely.points([[0.5, 0.5], [1.5, 0.5], [-3, 0], [10, 10]]))
+
+        self.assertEqual(regions["city"], [("city", "City"), ("city", "City"), None, None])
+        self.assertEqual(regions["county"], [("west", "West"), ("east", "East"), None, None])
+        self.assertEqual(regions["msa"], [("metro", "Metro"), None, ("metro", "Metro"), None])
+
+    def test_lookup(self):
+        self.assertEqual(
+            self.index.lookup(1.5, 0.5), {"city": ("city", "City"), "county": ("east", "East"), "msa": None}
+        )
+
+
+class UpsertEntitiesTests(TestCase):
+    def import_states(self, *fips_codes, prune=False):
+        states = [
+            _build_entity(
+                State,
+                {"fips": fips, "name": fips, "geoid": int(fips), "abbreviation": fips},
+                shapely.box(int(fips), 0, int(fips) + 1, 1),
+            )
+            for fips in fips_codes
+        ]
+        return _upsert_entities(
+            State, states, ["fips"], ["name", "geoid", "abbreviation"], prune=prune, bump_versions=False
+        )
+
+    def test_areas_are_only_computed_for_imported_rows(self):
+        outside = State.objects.create(
+            fips="99",
+            name="Outside",
+            geoid=99,
+            abbreviation="OT",
+            boundary=MultiPolygon(Polygon.from_bbox((0, 0, 1, 1))),
+        )
+        self.import_states("01", "02")
+
+        areas = dict(State.objects.values_list("fips", "area_sq_km"))
+        # A 1° x 1° cell at the equator is about 12,300 km².
+        self.assertAlmostEqual(areas["01"], 12300, delta=100)
+        self.assertAlmostEqual(areas["02"], 12300, delta=100)
+        self.assertIsNone(areas[outside.fips])
+
+    def test_missing_entities_are_reported_and_pruned_on_request(self):
+        self.import_states("01", "02", "04")
+
+        summary = self.import_states("01", "04")
+        self.assertEqual((summary["unchanged"], summary["removed"], summary["pruned"]), (2, 1, 0))
+        self.assertTrue(State.objects.filter(fips="02").exists())
+
+        summary = self.import_states("01", "04", prune=True)
+        self.assertEqual((summary["removed"], summary["pruned"]), (1, 1))
+        self.assertEqual(sorted(State.objects.values_list("fips", flat=True)), ["01", "04"])
+
+
+class UpdateModelPopulationTests(SimpleTestCase):
+    def model(self, rows):
+        model_class = mock.Mock(side_effect=SimpleNamespace, __name__="County")
+        queryset = model_class.objects.all.return_value.filter.return_value
+        queryset.values_list.return_value = rows
+        return model_class
+
+    def census_frame(self, rows):
+        return pd.DataFrame(rows, columns=["state", "county", "P1_001N"])
+
+    def test_updates_changed_populations_only(self):
+        model_class = self.model([("01", "001", "a", 100), ("01", "003", "b", 200)])
+        df = self.census_frame([("1", "001", "100"), ("1", "003", "250"), ("1", "999", "5")])
+
+        with self.assertLogs("geographic.helpers", "WARNING"):
+            summary = update_model_population(df, model_class, "county", state_filter=True)
+
+        self.assertEqual(summary, {"matched": 2, "updated": 1, "unmatched_count": 1, "unmatched_sample": ["01999"]})
+        (written, fields), _ = model_class.objects.bulk_update.call_args
+        self.assertEqual([(obj.pk, obj.population) for obj in written], [("b", 250)])
+        self.assertEqual(fields, ["population"])
+
+    def test_caps_the_unmatched_sample(self):
+        model_class = self.model([])
+        df = self.census_frame([("01", f"{i:03d}", "1") for i in range(UNMATCHED_FIPS_SAMPLE_SIZE * 2)])
+
+        with self.assertLogs("geographic.helpers", "WARNING") as logs:
+            summary = update_model_population(df, model_class, "county", state_filter=True)
+
+        self.assertEqual(summary["unmatched_count"], UNMATCHED_FIPS_SAMPLE_SIZE * 2)
+        self.assertEqual(summary["unmatched_sample"], [f"01{i:03d}" for i in range(UNMATCHED_FIPS_SAMPLE_SIZE)])
+        self.assertNotIn(f"01{UNMATCHED_FIPS_SAMPLE_SIZE:03d}", logs.output[0])
+
+    def test_per_state_fallback_sums_counts_and_caps_the_sample(self):
+        client = mock.MagicMock(metrics={})
+        client.__enter__.return_value = client
+        client.get_many.return_value = [
+            ((["NAME", "P1_001N"], "county:*", f"state:{fips}"), self.census_frame([])) for fips in ("01", "02")
+        ]
+        state_summary = {
+            "matched": 1,
+            "updated": 0,
+            "unmatched_count": 30,
+            "unmatched_sample": ["x"] * UNMATCHED_FIPS_SAMPLE_SIZE,
+        }
+        patches = [
+            mock.patch.object(tasks, "CensusAPIClient", return_value=client),
+            mock.patch.object(tasks, "fetch_census_population_data", side_effect=requests.ConnectionError),
+            mock.patch.object(tasks, "update_model_population", return_value=state_summary),
+            mock.patch.object(tasks.State, "objects", mock.Mock()),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        tasks.State.objects.values_list.return_value = [("01", "Alabama"), ("02", "Alaska")]
+
+        with self.assertLogs("geographic.tasks", "WARNING"):
+            summary = tasks.update_population_for_level(tasks.County, level="county", fips_field="county")
+
+        self.assertEqual((summary["matched"], summary["unmatched_count"]), (2, 60))
+        self.assertEqual(len(summary["unmatched_sample"]), UNMATCHED_FIPS_SAMPLE_SIZE)
+
+
+class AggregateByPolygonTests(TestCase):
+    metrics = ["census_population_2020", "median_household_income"]
+
+    @classmethod
+    def setUpTestData(cls):
+        # Two 1° x 1° counties side by side on the equator; the west one is stored as two subdivided pieces.
+        state = State.objects.create(fips="01", name="State", geoid=1, abbreviation="ST")
+        content_type = ContentType.objects.get_for_model(County)
+        counties = {
+            "west": ((0, 0, 1, 1), [(0, 0, 0.5, 1), (0.5, 0, 1, 1)], 1000, 50000),
+            "east": ((1, 0, 2, 1), [(1, 0, 2, 1)], 3000, 70000),
+        }
+        for fips, (name, (bbox, pieces, population, income)) in zip(("001", "003"), counties.items()):
+            boundary = MultiPolygon(Polygon.from_bbox(bbox), srid=4326)
+            county = County.objects.create(
+                fips=fips,
+                state=state,
+                name=name,
+                namelsad=name,
+                geoid=int(f"01{fips}"),
+                population=population,
+                boundary=boundary,
+                centroid=boundary.centroid,
+                area_sq_km=abs(WGS84.geometry_area_perimeter(shapely.box(*bbox))[0]) / 1e6,
+            )
+            for piece in pieces:
+                BoundarySubdivision.objects.create(
+                    content_type=content_type, object_id=county.uuid, piece=Polygon.from_bbox(piece, srid=4326)
+                )
+            # Only the latest profile counts.
+            for year, scale in ((2022, 2), (2023, 1)):
+                CensusProfile.objects.create(
+                    year=year,
+                    content_type=content_type,
+                    object_id=county.uuid,
+                    population=CensusPopulation.objects.create(pop_census_apr2020=population * scale),
+                    socio_economic=CensusSocioEconomicProfile.objects.create(median_household_income=income * scale),
+                )
+
+    def aggregate(self, bbox, mode):
+        polygon = parse_query_polygon(shapely.geometry.mapping(shapely.box(*bbox)))
+        return AggregateByPolygonAPIView.aggregate(County, polygon, mode, self.metrics)
+
+    def test_area_mode_weights_by_the_covered_share(self):
+        # Half of each county: 500 + 1,500 people, and incomes averaged weighted by the people inside.
+        totals = self.aggregate((0.5, -1, 1.5, 2), "area")
+
+        self.assertEqual(totals["entities"], 2)
+        self.assertAlmostEqual(totals["population"], 2000, delta=1)
+        self.assertAlmostEqual(totals["metrics"]["census_population_2020"], 2000, delta=1)
+        self.assertAlmostEqual(totals["metrics"]["median_household_income"], 65000, delta=1)
+
+    def test_area_mode_mixes_covered_and_intersected_pieces(self):
+        # Covers the first west piece and half of the second one.
+        totals = self.aggregate((-1, -1, 0.75, 2), "area")
+
+        self.assertEqual(totals["entities"], 1)
+        self.assertAlmostEqual(totals["population"], 750, delta=1)
+        self.assertAlmostEqual(totals["metrics"]["median_household_income"], 50000, delta=1)
+
+    def test_centroid_mode_counts_whole_entities(self):
+        totals = self.aggregate((0.25, 0.25, 1.25, 0.75), "centroid")
+
+        self.assertEqual(totals["entities"], 1)
+        self.assertEqual(totals["population"], 1000)
+        self.assertEqual(totals["metrics"], {"census_population_2020": 1000.0, "median_household_income": 50000.0})
+
+    def test_polygons_outside_every_entity(self):
+        totals = self.aggregate((10, 10, 11, 11), "area")
+
+        self.assertEqual(totals["entities"], 0)
+        self.assertIsNone(totals["population"])
+        self.assertEqual(totals["metrics"], {"census_population_2020": None, "median_household_income": None})
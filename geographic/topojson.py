@@ -0,0 +1,146 @@
+"""
+Minimal TopoJSON (https://github.com/topojson/topojson-specification) encoder for polygonal GeoJSON features.
+
+Coordinates are quantized onto a grid of ``10 ** -precision`` degrees, rings are cut at the points where
+neighbouring boundaries meet or diverge (junctions), and every resulting arc is stored once and delta-encoded,
+so the border shared by two counties is only sent one time.
+"""
+
+
+def encode_topology(features, object_name, precision):
+    """
+    Encodes GeoJSON ``features`` (dicts with a Polygon or MultiPolygon geometry) into a TopoJSON topology
+    holding a single GeometryCollection named ``object_name``. Coordinates are expected to be rounded to
+    ``precision`` decimals already (e.g. by ``ST_AsGeoJSON``), which makes the quantization lossless.
+    """
+    polygons = [_polygons(feature["geometry"]) for feature in features]
+    points = [point for feature in polygons for polygon in feature for ring in polygon for point in ring]
+    if not points:
+        return {
+            "type": "Topology",
+            "objects": {object_name: {"type": "GeometryCollection", "geometries": []}},
+            "arcs": [],
+        }
+
+    scale = 10**-precision
+    min_x = min(x for x, _ in points)
+    min_y = min(y for _, y in points)
+    max_x = max(x for x, _ in points)
+    max_y = max(y for _, y in points)
+
+    def quantize(ring):
+        quantized = []
+        for x, y in ring:
+            point = (round((x - min_x) / scale), round((y - min_y) / scale))
+            if not quantized or quantized[-1] != point:
+                quantized.append(point)
+        if len(quantized) > 1 and quantized[0] == quantized[-1]:
+            quantized.pop()
+        return quantized if len(quantized) >= 3 else None
+
+    quantized_features = []
+    for feature in polygons:
+        quantized_polygons = []
+        for polygon in feature:
+            rings = [quantize(ring) for ring in polygon]
+            if rings[0] is None:
+                continue  # The exterior collapsed onto the grid, so the holes go with it.
+            quantized_polygons.append([ring for ring in rings if ring is not None])
+        quantized_features.append(quantized_polygons)
+
+    rings = [ring for feature in quantized_features for polygon in feature for ring in polygon]
+    junctions = _find_junctions(rings)
+
+    arcs = []
+    arc_index = {}
+
+    def arc_id(arc):
+        key = tuple(arc)
+        if key in arc_index:
+            return arc_index[key]
+        reversed_key = key[::-1]
+        if reversed_key in arc_index:
+            return ~arc_index[reversed_key]
+        arc_index[key] = len(arcs)
+        arcs.append(key)
+        return arc_index[key]
+
+    geometries = []
+    for feature, quantized_polygons in zip(features, quantized_features):
+        if not quantized_polygons:
+            continue
+        geometry = {
+            "type": "MultiPolygon",
+            "arcs": [
+                [[arc_id(arc) for arc in _cut_ring(ring, junctions)] for ring in polygon]
+                for polygon in quantized_polygons
+            ],
+        }
+        if "id" in feature:
+            geometry["id"] = feature["id"]
+        if feature.get("properties"):
+            geometry["properties"] = feature["properties"]
+        geometries.append(geometry)
+
+    return {
+        "type": "Topology",
+        "bbox": [min_x, min_y, max_x, max_y],
+        "transform": {"scale": [scale, scale], "translate": [min_x, min_y]},
+        "objects": {object_name: {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": [_delta_encode(arc) for arc in arcs],
+    }
+
+
+def _polygons(geometry):
+    if not geometry:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def _find_junctions(rings):
+    """
+    Returns the points where rings meet or diverge: a point is a junction once it is seen with two different
+    pairs of neighbours. Points along a shared border have the same neighbours (in reverse order) in both rings.
+    """
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        count = len(ring)
+        for i, point in enumerate(ring):
+            pair = frozenset((ring[i - 1], ring[(i + 1) % count]))
+            seen = neighbours.setdefault(point, pair)
+            if seen != pair:
+                junctions.add(point)
+    return junctions
+
+
+def _cut_ring(ring, junctions):
+    """
+    Splits a (open) ring into arcs that start and end on junctions. A ring without junctions becomes a single
+    closed arc, rotated to start at its smallest point so that identical rings produce identical (or reversed) arcs.
+    """
+    starts = [i for i, point in enumerate(ring) if point in junctions]
+    if not starts:
+        start = min(range(len(ring)), key=ring.__getitem__)
+        return [ring[start:] + ring[: start + 1]]
+
+    rotated = ring[starts[0] :] + ring[: starts[0]] + ring[starts[0] : starts[0] + 1]
+    arcs = []
+    current = [rotated[0]]
+    for point in rotated[1:]:
+        current.append(point)
+        if point in junctions:
+            arcs.append(current)
+            current = [point]
+    return arcs
+
+
+def _delta_encode(arc):
+    encoded = [list(arc[0])]
+    for (x0, y0), (x1, y1) in zip(arc, arc[1:]):
+        encoded.append([x1 - x0, y1 - y0])
+    return encoded
@@ -1,29 +1,87 @@
 import json
+import math
 
-from django.contrib.gis.db.models.functions import Distance
-from django.contrib.gis.geos import Point, Polygon, GEOSGeometry
+import numpy as np
+import shapely
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models.functions import AsGeoJSON, Distance, GeometryDistance, Transform
+from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.measure import D
 from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Case, CharField, Exists, FloatField, Func, OuterRef, Q, Value, When
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from geographic.constants import ENTITY_MODELS
-from geographic.helpers import get_simplification_tolerance
-from geographic.models import County, City, MSA
+from census.models import CensusProfile
+from common.helpers import batched, compress_payload, compressed_response, decode_cursor, encode_cursor
+from geographic.cache import get_dataset_version
+from geographic.constants import (
+    AGGREGATE_LEVELS,
+    AGGREGATE_METRICS,
+    BATCH_LOOKUP_MAX_POINTS,
+    BOUNDARY_TILE_ZOOM_OFFSET,
+    DATASET_CACHE_TIMEOUT,
+    ENTITY_MODELS,
+    MAX_BOUNDARY_TILES,
+    MAX_COORDINATE_PRECISION,
+    MAX_TOPOJSON_PRECISION,
+    MVT_EXTENT,
+    NEARBY_DEFAULT_LIMIT,
+    NEARBY_DEFAULT_RADIUS,
+    NEARBY_MAX_LIMIT,
+    POLYGON_DEFAULT_LIMIT,
+    POLYGON_MAX_LIMIT,
+    STREAM_CHUNK_SIZE,
+    MAX_TILE_ZOOM,
+    TILE_CACHE_TIMEOUT,
+)
+from geographic.functions import AsMVTGeom, TileEnvelope
+from geographic.helpers import (
+    get_bbox_tiles,
+    get_boundary_expression,
+    get_coordinate_precision,
+    get_culling_filter,
+    lng_lat_to_tile,
+    parse_query_polygon,
+    subdivision_filter,
+    tile_bounds,
+)
+from geographic.models import BoundarySubdivision, City
+from geographic.parsers import NDJSONParser
+from geographic.renderers import TopoJSONRenderer
 from geographic.serializers import NearbyCitySerializer, CityByPolygonSerializer
+from geographic.spatial_index import get_region_index
+from geographic.topojson import encode_topology
 
 
 class BoundariesAPIView(APIView):
     """
     API endpoint that returns simplified geo-boundary data for states, counties, or cities,
     filtered by bounding box and zoom level. This refactored version includes caching.
+
+    ``precision`` sets the number of coordinate decimals (derived from the zoom level by default) and
+    ``format=topojson`` returns a TopoJSON topology in which shared borders are encoded once. With ``stream=true``
+    the features are streamed straight from a server-side cursor instead, bypassing the tile cache.
     """
 
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, TopoJSONRenderer]
+
     def get(self, request):
         entity_type = request.GET.get("type")
         bbox = request.GET.get("bbox")
         try:
             zoom = float(request.GET.get("zoom", 6))
+            if not math.isfinite(zoom):
+                raise ValueError("zoom must be finite")
         except ValueError:
             return Response({"error": "Invalid zoom value"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -36,116 +94,592 @@ class BoundariesAPIView(APIView):
         if not bbox:
             return Response({"error": "Missing bbox"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Build a unique cache key based on the request parameters.
-        cache_key = f"boundaries:{entity_type}:{bbox}:{zoom}"
-        cached_response = cache.get(cache_key)
-        if cached_response is not None:
-            # If a cached response exists, return it immediately.
-            return Response(cached_response)
-
-        # Parse the bbox string and create a polygon for filtering.
+        # Parse the bbox string.
         try:
             min_lng, min_lat, max_lng, max_lat = map(float, bbox.split(","))
-            bbox_poly = Polygon.from_bbox((min_lng, min_lat, max_lng, max_lat))
-            bbox_poly.srid = 4326
+            if not all(map(math.isfinite, (min_lng, min_lat, max_lng, max_lat))):
+                raise ValueError("bbox values must be finite")
+            if min_lng > max_lng or min_lat > max_lat:
+                raise ValueError("bbox minimum exceeds maximum")
         except ValueError:
             return Response({"error": "Invalid bbox format"}, status=status.HTTP_400_BAD_REQUEST)
 
-        tolerance = get_simplification_tolerance(zoom)
-        queryset = model.objects.filter(boundary__intersects=bbox_poly)
-
-        features = []
-        for obj in queryset:
-            if obj.boundary:
-                boundary = obj.boundary
-
-                # Only apply simplification when zoom level is lower than 12
-                if zoom < 12:
-                    boundary = boundary.simplify(tolerance, preserve_topology=True)
-
-                # Ensure the spatial reference is set correctly
-                boundary.srid = 4326
-
-                try:
-                    geometry = json.loads(boundary.geojson)
-                except Exception:
-                    continue  # Skip this object if the geometry is invalid
-
-                features.append(
-                    {
-                        "type": "Feature",
-                        "geometry": geometry,
-                        "properties": {
-                            "uuid": obj.uuid,
-                            "name": obj.name,
-                            "slug": obj.quick_fact_slug,
-                        },
-                    }
-                )
+        # Snap the viewport to the tile grid so nearby viewports share cache entries. Features are simplified
+        # for the integer zoom level, which lands in the same tolerance band as the requested zoom.
+        zoom = max(0, min(math.floor(zoom), MAX_TILE_ZOOM))
 
-        result = {"type": "FeatureCollection", "features": features}
-        # Cache the result for 5 minutes (300 seconds)
-        cache.set(cache_key, result, timeout=300)
-        return Response(result)
+        stream = request.GET.get("stream", "").lower() in ("1", "true", "yes")
+        topojson = request.accepted_renderer.format == TopoJSONRenderer.format
+
+        # TopoJSON quantizes coordinates to integers, which JavaScript only holds exactly up to 2**53.
+        max_precision = MAX_TOPOJSON_PRECISION if topojson else MAX_COORDINATE_PRECISION
+        try:
+            precision = int(request.GET.get("precision", get_coordinate_precision(zoom)))
+        except ValueError:
+            return Response({"error": "Invalid precision value"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= precision <= max_precision:
+            return Response(
+                {"error": f"precision must be between 0 and {max_precision}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if stream and topojson:
+            return Response({"error": "stream is not supported for TopoJSON"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Responses only change when the dataset version does, so clients can revalidate with If-None-Match.
+        # The ETag is weak because the same content is served gzipped or not depending on Accept-Encoding, and
+        # it names the format, which may be negotiated from the Accept header (see ``finalize_response``).
+        version = get_dataset_version()
+        etag = f"W/{quote_etag(f'{entity_type}-{request.accepted_renderer.format}-{version}')}"
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        if stream:
+            bbox_poly = Polygon.from_bbox((min_lng, min_lat, max_lng, max_lat))
+            bbox_poly.srid = 4326
+            response = StreamingHttpResponse(
+                self.stream_features(model, entity_type, bbox_poly, zoom, precision), content_type="application/json"
+            )
+            response["ETag"] = etag
+            return response
+
+        tile_zoom, tiles = get_bbox_tiles(
+            (min_lng, min_lat, max_lng, max_lat),
+            max(0, zoom - BOUNDARY_TILE_ZOOM_OFFSET),
+            MAX_BOUNDARY_TILES,
+        )
+
+        # The composed response only depends on the snapped tile range, so it is cached (gzipped) as a whole too.
+        (min_x, min_y), (max_x, max_y) = tiles[0], tiles[-1]
+        response_key = (
+            f"boundaries:response:{version}:{entity_type}:{zoom}:{precision}:{request.accepted_renderer.format}:"
+            f"{tile_zoom}:{min_x}:{min_y}:{max_x}:{max_y}"
+        )
+        payload = cache.get(response_key)
+        if payload is None:
+            payload = compress_payload(
+                self.render_body(model, entity_type, zoom, precision, topojson, tile_zoom, tiles, version)
+            )
+            cache.set(response_key, payload, timeout=DATASET_CACHE_TIMEOUT)
+
+        response = compressed_response(request, payload, "application/json")
+        response["ETag"] = etag
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Marks every response as varying on ``Accept``, so shared caches keep GeoJSON and TopoJSON apart.
+        """
+        response = super().finalize_response(request, response, *args, **kwargs)
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    def render_body(self, model, entity_type, zoom, precision, topojson, tile_zoom, tiles, version):
+        """
+        Composes the GeoJSON (or TopoJSON) body for a range of grid tiles from the per-tile feature cache.
+        """
+        # Fetch every cached tile in one round trip (MGET) and only render the missing ones.
+        cache_keys = {
+            tile: f"boundaries:tile:{version}:{entity_type}:{zoom}:{precision}:{tile_zoom}:{tile[0]}:{tile[1]}"
+            for tile in tiles
+        }
+        cached = cache.get_many(cache_keys.values())
+        tile_contents = {tile: cached[key] for tile, key in cache_keys.items() if key in cached}
+
+        missing = [tile for tile in tiles if tile not in tile_contents]
+        if missing:
+            rendered = self.render_tiles(model, entity_type, zoom, precision, tile_zoom, missing)
+            cache.set_many({cache_keys[tile]: rendered[tile] for tile in missing}, timeout=DATASET_CACHE_TIMEOUT)
+            tile_contents.update(rendered)
+
+        # Features spanning several tiles are cached in each of them; keep one copy per uuid. Culled features are
+        # only counted by the tile holding their centroid, so they can simply be summed.
+        features = {}
+        culled = 0
+        for tile in tiles:
+            for uuid, feature in tile_contents[tile]["features"]:
+                features.setdefault(uuid, feature)
+            culled += tile_contents[tile]["culled"]
+
+        if topojson:
+            topology = encode_topology([json.loads(feature) for feature in features.values()], entity_type, precision)
+            topology["culled"] = culled
+            return json.dumps(topology, separators=(",", ":"))
+        return '{"type": "FeatureCollection", "features": [' + ", ".join(features.values()) + f'], "culled": {culled}}}'
+
+    @staticmethod
+    def stream_features(model, entity_type, bbox_poly, zoom, precision):
+        """
+        Yields a FeatureCollection in chunks of ``STREAM_CHUNK_SIZE`` features. Rows are read through a
+        server-side cursor, so memory stays bounded by the chunk size whatever the size of the result.
+        """
+        queryset = model.objects.filter(subdivision_filter(model, "intersects", bbox_poly))
+        visible = get_culling_filter(entity_type, zoom)
+        rows = (
+            (queryset.filter(visible) if visible else queryset)
+            .annotate(
+                id=Cast("uuid", CharField()),
+                slug=model.quick_fact_slug_expression(),
+                geojson=AsGeoJSON(get_boundary_expression(model, zoom), precision=precision),
+            )
+            .order_by()
+            .values_list("id", "name", "slug", "geojson")
+            .iterator(chunk_size=STREAM_CHUNK_SIZE)
+        )
+
+        yield '{"type": "FeatureCollection", "features": ['
+        separator = ""
+        for chunk in batched(rows, STREAM_CHUNK_SIZE):
+            features = [
+                '{"type": "Feature", "geometry": %s, "properties": %s}'
+                % (geojson, json.dumps({"uuid": uuid, "name": name, "slug": slug}))
+                for uuid, name, slug, geojson in chunk
+                if geojson is not None
+            ]
+            if features:
+                yield separator + ", ".join(features)
+                separator = ", "
+
+        culled = queryset.exclude(visible).count() if visible else 0
+        yield f'], "culled": {culled}}}'
+
+    @staticmethod
+    def render_tiles(model, entity_type, zoom, precision, tile_zoom, tiles):
+        """
+        Renders the features of several grid tiles in one query. Each feature is serialized to GeoJSON by
+        PostgreSQL (``ST_AsGeoJSON`` + ``json_build_object``), so no geometry is materialized in Python.
+        Features culled at this zoom (see ``ZOOM_CULLING``) are not serialized, only counted.
+
+        Returns a ``{(x, y): {"features": [(uuid, feature JSON), ...], "culled": count}}`` dict with an entry
+        for every tile.
+        """
+        envelopes = []
+        for x, y in tiles:
+            envelope = Polygon.from_bbox(tile_bounds(tile_zoom, x, y))
+            envelope.srid = 4326
+            envelopes.append(envelope)
+        # Candidates are found with one envelope over the whole tile range, as the union of edge-sharing tiles
+        # is not a valid MultiPolygon. Features in the range but outside every missing tile match no flag below.
+        min_lngs, min_lats, max_lngs, max_lats = zip(*(envelope.extent for envelope in envelopes))
+        tile_range = Polygon.from_bbox((min(min_lngs), min(min_lats), max(max_lngs), max(max_lats)))
+        tile_range.srid = 4326
+
+        # Boundaries come back simplified for the zoom band (only below zoom 12), so the full geometry is never loaded.
+        # Tile membership is tested against the subdivided pieces as well, never against the full boundary.
+        pieces = BoundarySubdivision.objects.filter(
+            content_type=ContentType.objects.get_for_model(model), object_id=OuterRef("pk")
+        )
+        flags = {f"tile_{i}": Exists(pieces.filter(piece__intersects=envelope)) for i, envelope in enumerate(envelopes)}
+        visible = get_culling_filter(entity_type, zoom) or Q(pk__isnull=False)
+        queryset = (
+            model.objects.filter(subdivision_filter(model, "intersects", tile_range))
+            .annotate(
+                id=Cast("uuid", CharField()),
+                slug=model.quick_fact_slug_expression(),
+                visible=Case(When(visible, then=Value(True)), default=Value(False)),
+                geojson=Case(
+                    When(visible, then=AsGeoJSON(get_boundary_expression(model, zoom), precision=precision)),
+                    default=None,
+                ),
+                centroid_lng=Func("centroid", function="ST_X", output_field=FloatField()),
+                centroid_lat=Func("centroid", function="ST_Y", output_field=FloatField()),
+                **flags,
+            )
+            .order_by()
+            .values("id", "name", "slug", "visible", "geojson", "centroid_lng", "centroid_lat", *flags)
+        )
+        sql, params = queryset.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT
+                    feature.id,
+                    CASE WHEN feature.visible THEN json_build_object(
+                        'type', 'Feature',
+                        'geometry', feature.geojson::json,
+                        'properties', json_build_object('uuid', feature.id, 'name', feature.name, 'slug', feature.slug)
+                    )::text END,
+                    feature.centroid_lng,
+                    feature.centroid_lat,
+                    {", ".join(f"feature.{flag}" for flag in flags)}
+                FROM ({sql}) AS feature
+                WHERE feature.geojson IS NOT NULL OR NOT feature.visible
+                """,
+                params,
+            )
+            rows = cursor.fetchall()
+
+        rendered = {tile: {"features": [], "culled": 0} for tile in tiles}
+        for uuid, feature, centroid_lng, centroid_lat, *in_tiles in rows:
+            if feature is None:
+                tile = lng_lat_to_tile(centroid_lng, centroid_lat, tile_zoom) if centroid_lng is not None else None
+                if tile in rendered:
+                    rendered[tile]["culled"] += 1
+                continue
+            for tile, in_tile in zip(tiles, in_tiles):
+                if in_tile:
+                    rendered[tile]["features"].append((uuid, feature))
+        return rendered
+
+
+class TilesAPIView(APIView):
+    """
+    API endpoint that serves state, county, city or MSA boundaries as Mapbox Vector Tiles, encoded by PostGIS
+    (``ST_AsMVT``) with the same zoom-dependent simplification as the boundaries endpoint.
+    """
+
+    def get(self, request, entity_type, z, x, y):
+        model = ENTITY_MODELS.get(entity_type)
+        if not model:
+            return Response({"error": "Invalid type"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not (0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z):
+            return Response({"error": "Invalid tile coordinates"}, status=status.HTTP_400_BAD_REQUEST)
+
+        version = get_dataset_version()
+        etag = f"W/{quote_etag(f'{entity_type}-{version}')}"
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        cache_key = f"tiles:{version}:{entity_type}:{z}:{x}:{y}"
+        payload = cache.get(cache_key)
+        if payload is None:
+            payload = compress_payload(self.render_tile(model, entity_type, z, x, y))
+            cache.set(cache_key, payload, timeout=DATASET_CACHE_TIMEOUT)
+
+        response = compressed_response(request, payload, "application/vnd.mapbox-vector-tile")
+        response["Cache-Control"] = f"public, max-age={TILE_CACHE_TIMEOUT}"
+        response["ETag"] = etag
+        return response
+
+    @staticmethod
+    def render_tile(model, layer, z, x, y):
+        tile_poly = Polygon.from_bbox(tile_bounds(z, x, y))
+        tile_poly.srid = 4326
+
+        queryset = (
+            model.objects.filter(subdivision_filter(model, "intersects", tile_poly))
+            .annotate(
+                id=Cast("uuid", CharField()),
+                slug=model.quick_fact_slug_expression(),
+                geom=AsMVTGeom(Transform(get_boundary_expression(model, z), 3857), TileEnvelope(z, x, y), MVT_EXTENT),
+            )
+            .order_by()
+            .values("id", "name", "slug", "geom")
+        )
+        sql, params = queryset.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT ST_AsMVT(tile, %s, %s, 'geom') FROM ({sql}) AS tile WHERE geom IS NOT NULL",
+                [layer, MVT_EXTENT, *params],
+            )
+            tile = cursor.fetchone()[0]
+        return bytes(tile) if tile else b""
 
 
 class NearbyCitiesAPIView(APIView):
+    """
+    Cities whose centroid lies within ``radius`` metres of ``lat``/``lng``, nearest first. Both the radius
+    filter (``ST_DWithin``) and the ordering (the ``<->`` KNN operator) run on the GiST index of the geography
+    centroid. Results come in pages of ``limit`` cities; the ``X-Next-Cursor`` response header holds the
+    ``cursor`` parameter for the next page.
+    """
+
     def get(self, request):
         try:
             lat = float(request.GET.get("lat"))
             lng = float(request.GET.get("lng"))
+            if not (math.isfinite(lat) and math.isfinite(lng)):
+                raise ValueError("latitude/longitude must be finite")
+            if abs(lat) > 90 or abs(lng) > 180:
+                raise ValueError("latitude/longitude out of range")
         except (TypeError, ValueError):
             return Response({"error": "Invalid or missing latitude/longitude."}, status=status.HTTP_400_BAD_REQUEST)
 
-        radius = float(request.GET.get("radius", 20000))  # default radius in meters
+        try:
+            radius = float(request.GET.get("radius", NEARBY_DEFAULT_RADIUS))  # radius in meters
+            limit = int(request.GET.get("limit", NEARBY_DEFAULT_LIMIT))
+            if not (math.isfinite(radius) and radius > 0):
+                raise ValueError("radius must be positive and finite")
+        except ValueError:
+            return Response({"error": "Invalid radius or limit."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, NEARBY_MAX_LIMIT))
 
         # Create a point using the provided coordinates
         point = Point(lng, lat, srid=4326)
 
-        # Annotate the distance and filter out cities without a centroid.
         cities = (
-            City.objects.annotate(distance=Distance("centroid", point))
-            .filter(distance__lte=radius, centroid__isnull=False)
-            .order_by("distance")
+            City.objects.filter(centroid_geography__dwithin=(point, D(m=radius)))
+            .annotate(knn_distance=GeometryDistance("centroid_geography", point))
+            .only("uuid", "name", "centroid")
+            .order_by("knn_distance", "uuid")
         )
 
-        serializer = NearbyCitySerializer(cities, many=True)
-        return Response(serializer.data)
+        # Keyset pagination: continue after the (distance, uuid) of the last city of the previous page.
+        cursor = request.GET.get("cursor")
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+                cities = cities.filter(
+                    Q(knn_distance__gt=after["distance"]) | Q(knn_distance=after["distance"], uuid__gt=after["uuid"])
+                )
+            except (KeyError, TypeError, ValueError, ValidationError):
+                return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The exact (spheroidal) distance is only computed for the cities of this page.
+        page = list(cities.annotate(distance=Distance("centroid_geography", point))[: limit + 1])
+
+        serializer = NearbyCitySerializer(page[:limit], many=True)
+        response = Response(serializer.data)
+        if len(page) > limit:
+            last = page[limit - 1]
+            response["X-Next-Cursor"] = encode_cursor({"distance": last.knn_distance, "uuid": last.uuid})
+        return response
 
 
 class CitiesByPolygonAPIView(APIView):
+    """
+    Cities intersecting the GeoJSON Polygon or MultiPolygon posted as ``geometry``. With ``?mode=centroid`` only
+    the city centroid has to lie in the polygon, which is much cheaper than testing boundaries. Both modes
+    prefilter on bounding boxes (``&&``) against the GiST index. Polygons are capped in vertices and area, and
+    results come in pages of ``limit`` cities ordered by uuid; the ``X-Next-Cursor`` response header holds the
+    ``cursor`` parameter for the next page.
+    """
+
     def post(self, request):
         geojson = request.data.get("geometry")
 
         if not geojson:
             return Response({"error": "Missing geometry"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create a polygon from the provided geojson geometry
-        polygon = GEOSGeometry(str(geojson), srid=4326)
+        try:
+            polygon = parse_query_polygon(geojson)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Filter cities with boundaries intersecting the polygon and ensure centroid is present.
-        cities = City.objects.filter(boundary__intersects=polygon, centroid__isnull=False)
+        mode = request.GET.get("mode", "boundary")
+        if mode not in ("boundary", "centroid"):
+            return Response({"error": "mode must be 'boundary' or 'centroid'."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Serialize the queryset
-        serializer = CityByPolygonSerializer(cities, many=True)
-        return Response(serializer.data)
+        try:
+            limit = int(request.GET.get("limit", POLYGON_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, POLYGON_MAX_LIMIT))
+
+        if mode == "centroid":
+            cities = City.objects.filter(centroid__bboverlaps=polygon, centroid__intersects=polygon)
+        else:
+            # Filter cities with boundaries intersecting the polygon and ensure centroid is present.
+            cities = City.objects.filter(
+                boundary__bboverlaps=polygon,
+                centroid__isnull=False,
+            ).filter(subdivision_filter(City, "intersects", polygon))
+        cities = cities.only("uuid", "name", "fips", "centroid").order_by("uuid")
+
+        # Keyset pagination: continue after the last city of the previous page.
+        cursor = request.GET.get("cursor")
+        if cursor:
+            try:
+                cities = cities.filter(uuid__gt=decode_cursor(cursor)["uuid"])
+            except (KeyError, TypeError, ValueError, ValidationError):
+                return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = list(cities[: limit + 1])
+
+        # Serialize the page
+        serializer = CityByPolygonSerializer(page[:limit], many=True)
+        response = Response(serializer.data)
+        if len(page) > limit:
+            response["X-Next-Cursor"] = encode_cursor({"uuid": page[limit - 1].uuid})
+        return response
 
 
 class EncompassingRegionAPIView(APIView):
-    def get(self, request):
-        lat = float(request.GET.get("lat"))
-        lng = float(request.GET.get("lng"))
+    """
+    Names of the city, county and MSA containing ``lat``/``lng``, answered from the process-local region
+    index without a database round trip. The MSA is the precomputed one of the containing county.
+    """
 
-        point = Point(lng, lat, srid=4326)
+    def get(self, request):
+        try:
+            lat = float(request.GET.get("lat"))
+            lng = float(request.GET.get("lng"))
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid or missing latitude/longitude."}, status=status.HTTP_400_BAD_REQUEST)
 
-        city = City.objects.filter(boundary__contains=point).first()
-        county = County.objects.filter(boundary__contains=point).first()
-        msa = MSA.objects.filter(boundary__contains=point).first()
+        regions = get_region_index().lookup(lng, lat)
 
         return Response(
             {
-                "city": city.name if city else None,
-                "county": county.name if county else None,
-                "msa": msa.name if msa else None,
+                "city": regions["city"][1] if regions["city"] else None,
+                "county": regions["county"][1] if regions["county"] else None,
+                "msa": regions["msa"][1] if regions["msa"] else None,
             }
         )
+
+
+class BatchEncompassingRegionAPIView(APIView):
+    """
+    Batch version of ``EncompassingRegionAPIView``. The body is a JSON array of ``{"lat": ..., "lng": ...}``
+    objects, or the same objects as NDJSON (``Content-Type: application/x-ndjson``, one point per line). All
+    points are resolved against the region index in one vectorized pass and the results come back in input order.
+    """
+
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser]
+
+    def post(self, request):
+        points = request.data
+        if not isinstance(points, list) or not points:
+            return Response({"error": "Expected a non-empty list of points."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(points) > BATCH_LOOKUP_MAX_POINTS:
+            return Response(
+                {"error": f"At most {BATCH_LOOKUP_MAX_POINTS} points per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            coordinates = np.array([(float(point["lng"]), float(point["lat"])) for point in points])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"error": "Every point needs a numeric latitude and longitude."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        regions = get_region_index().lookup_many(shapely.points(coordinates))
+
+        return Response(
+            [
+                {level: match[1] if match else None for level, match in zip(regions, matches)}
+                for matches in zip(*regions.values())
+            ]
+        )
+
+
+class AggregateByPolygonAPIView(APIView):
+    """
+    Population and ``AGGREGATE_METRICS`` census totals inside the GeoJSON Polygon or MultiPolygon posted as
+    ``geometry``, interpolated from the counties or cities (``?level=``) it covers.
+
+    The default ``?mode=area`` weights every entity by the share of its area inside the polygon, measured on its
+    subdivided boundary pieces (pieces fully inside are not intersected). ``?mode=centroid`` counts entities whose
+    centroid lies inside the polygon in full, which is much cheaper. ``?metrics=`` selects a comma-separated subset
+    of the metrics. Everything is computed in a single SQL statement.
+    """
+
+    def post(self, request):
+        geojson = request.data.get("geometry")
+
+        if not geojson:
+            return Response({"error": "Missing geometry"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            polygon = parse_query_polygon(geojson)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        level = request.GET.get("level", "county")
+        if level not in AGGREGATE_LEVELS:
+            return Response(
+                {"error": f"level must be one of {', '.join(AGGREGATE_LEVELS)}."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        mode = request.GET.get("mode", "area")
+        if mode not in ("area", "centroid"):
+            return Response({"error": "mode must be 'area' or 'centroid'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        metrics = request.GET.get("metrics")
+        metrics = (
+            [metric.strip() for metric in metrics.split(",") if metric.strip()] if metrics else list(AGGREGATE_METRICS)
+        )
+        unknown = [metric for metric in metrics if metric not in AGGREGATE_METRICS]
+        if unknown:
+            return Response({"error": f"Unknown metrics: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        totals = self.aggregate(ENTITY_MODELS[level], polygon, mode, metrics)
+        return Response({"level": level, "mode": mode, **totals})
+
+    @staticmethod
+    def aggregate(model, polygon, mode, metrics):
+        quote = connection.ops.quote_name
+        content_type = ContentType.objects.get_for_model(model)
+        entity_table = quote(model._meta.db_table)
+        params = [bytes(polygon.ewkb)]
+
+        if mode == "centroid":
+            weights = f"""
+                SELECT e.uuid, 1.0 AS weight
+                FROM {entity_table} e, query q
+                WHERE e.centroid && q.geom AND ST_Intersects(e.centroid, q.geom)
+            """
+        else:
+            weights = f"""
+                SELECT e.uuid, LEAST(covered.area / NULLIF(e.area_sq_km * 1e6, 0), 1.0) AS weight
+                FROM (
+                    SELECT s.object_id, SUM(
+                        CASE WHEN ST_CoveredBy(s.piece, q.geom) THEN ST_Area(s.piece::geography)
+                        ELSE ST_Area(ST_Intersection(s.piece, q.geom)::geography) END
+                    ) AS area
+                    FROM {quote(BoundarySubdivision._meta.db_table)} s, query q
+                    WHERE s.content_type_id = %s AND s.piece && q.geom AND ST_Intersects(s.piece, q.geom)
+                    GROUP BY s.object_id
+                ) covered
+                JOIN {entity_table} e ON e.uuid = covered.object_id
+            """
+            params.append(content_type.id)
+
+        # Join only the profile sections the requested metrics live in.
+        sections = {}
+        joins = []
+        for relation in dict.fromkeys(AGGREGATE_METRICS[metric][0] for metric in metrics):
+            field = CensusProfile._meta.get_field(relation)
+            alias = f"r{len(sections)}"
+            sections[relation] = (alias, field.related_model)
+            joins.append(
+                f"LEFT JOIN {quote(field.related_model._meta.db_table)} {alias} ON {alias}.uuid = p.{quote(field.column)}"
+            )
+
+        columns = []
+        for metric in metrics:
+            relation, name, aggregation = AGGREGATE_METRICS[metric]
+            alias, section_model = sections[relation]
+            value = f"{alias}.{quote(section_model._meta.get_field(name).column)}"
+            if aggregation == "sum":
+                columns.append(f"SUM({value} * w.weight)")
+            else:
+                columns.append(
+                    f"SUM({value} * e.population * w.weight) "
+                    f"/ NULLIF(SUM(CASE WHEN {value} IS NOT NULL THEN e.population * w.weight END), 0)"
+                )
+
+        sql = f"""
+            WITH query AS (SELECT ST_GeomFromEWKB(%s) AS geom),
+            weights AS ({weights}),
+            profiles AS (
+                SELECT DISTINCT ON (object_id) *
+                FROM {quote(CensusProfile._meta.db_table)}
+                WHERE content_type_id = %s AND object_id IN (SELECT uuid FROM weights)
+                ORDER BY object_id, year DESC
+            )
+            SELECT COUNT(*), SUM(e.population * w.weight){"".join(f", {column}" for column in columns)}
+            FROM weights w
+            JOIN {entity_table} e ON e.uuid = w.uuid
+            LEFT JOIN profiles p ON p.object_id = w.uuid
+            {" ".join(joins)}
+        """
+        params.append(content_type.id)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            entities, population, *values = cursor.fetchone()
+
+        return {
+            "entities": entities,
+            "population": round(population) if population is not None else None,
+            "metrics": {
+                metric: round(float(value), 2) if value is not None else None for metric, value in zip(metrics, values)
+            },
+        }
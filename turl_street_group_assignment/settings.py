@@ -95,14 +95,22 @@ DATABASES = {
 
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        "BACKEND": "common.cache.TwoTierRedisCache",
         "LOCATION": "redis://{}:{}/0".format(env.str("REDIS_HOST", "localhost"), env.int("REDIS_PORT", 6379)),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # In-process LRU in front of Redis, only for keys that embed the dataset version.
+            "LOCAL_MAX_BYTES": env.int("CACHE_LOCAL_MAX_BYTES", 64 * 1024 * 1024),
+            "LOCAL_TIMEOUT": env.int("CACHE_LOCAL_TIMEOUT", 300),
+            "LOCAL_KEY_PREFIXES": ["boundaries:", "tiles:", "census:profile:"],
         },
     }
 }
 
+CELERY_RESULT_BACKEND = env.str(
+    "CELERY_RESULT_BACKEND", "redis://{}:{}/1".format(env.str("REDIS_HOST", "localhost"), env.int("REDIS_PORT", 6379))
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -145,6 +153,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 CORS_ALLOW_CREDENTIALS = False
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ORIGIN_WHITELIST = env.list("CORS_ORIGIN_WHITELIST", default=["http://localhost:8080"])
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor"]
 
 CENSUS_QUICKFACT_MNEMONIC_CODE = env.str("CENSUS_QUICKFACT_MNEMONIC_CODE", "PST045224")
 CENSUS_QUICKFACT_SCRAPED_YEAR = int("20" + CENSUS_QUICKFACT_MNEMONIC_CODE[-2:])
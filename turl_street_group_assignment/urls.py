@@ -20,25 +20,33 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from census.views import CensusProfileViewSet
+from common.views import CacheStatsAPIView
 from geographic.views import (
+    AggregateByPolygonAPIView,
+    BatchEncompassingRegionAPIView,
     BoundariesAPIView,
     NearbyCitiesAPIView,
     CitiesByPolygonAPIView,
     EncompassingRegionAPIView,
+    TilesAPIView,
 )
 
 router = DefaultRouter()
 
 urlpatterns = [
     path("api/boundaries/", BoundariesAPIView.as_view(), name="boundaries-api"),
+    path("api/tiles/<str:entity_type>/<int:z>/<int:x>/<int:y>.pbf", TilesAPIView.as_view(), name="tiles-api"),
     path("api/query/nearby/", NearbyCitiesAPIView.as_view(), name="nearby-api"),
     path("api/query/by-polygon/", CitiesByPolygonAPIView.as_view(), name="polygon-api"),
+    path("api/query/aggregate/", AggregateByPolygonAPIView.as_view(), name="aggregate-api"),
     path("api/query/encompassing/", EncompassingRegionAPIView.as_view(), name="encompassing-api"),
+    path("api/query/encompassing/batch/", BatchEncompassingRegionAPIView.as_view(), name="encompassing-batch-api"),
     path(
         "api/census/profile/<str:entity_type>/<uuid:entity_id>/",
         CensusProfileViewSet.as_view({"get": "by_entity"}),
         name="census-profile-by-entity",
     ),
+    path("api/cache/stats/", CacheStatsAPIView.as_view(), name="cache-stats-api"),
     path("admin/", admin.site.urls),
     path("api/", include(router.urls)),
 ]